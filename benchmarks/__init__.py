@@ -0,0 +1,30 @@
+"""Offline benchmarks; see benchmarks.recommender and benchmarks.pipeline_calls."""
+import os
+import shutil
+import sys
+import tempfile
+from contextlib import contextmanager
+
+# Models are never downloaded
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+
+@contextmanager
+def isolated_cache(keep=False):
+    """Point FEATURE_CACHE_DIR at a fresh temporary directory, removed on exit unless keep.
+
+    Model modules read FEATURE_CACHE_DIR when they are imported, so this has
+    to be entered before the first of them is.
+    """
+    if "model.resumes" in sys.modules:
+        raise RuntimeError("isolated_cache() must be entered before any model module is imported")
+    path = tempfile.mkdtemp(prefix="jobswipe-bench-")
+    os.environ["FEATURE_CACHE_DIR"] = path
+    try:
+        yield path
+    finally:
+        if keep:
+            print(f"Kept benchmark data and caches in {path}", file=sys.stderr)
+        else:
+            shutil.rmtree(path, ignore_errors=True)
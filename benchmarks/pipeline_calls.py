@@ -0,0 +1,134 @@
+"""Regression benchmark: spaCy pipeline invocations per ranked item.
+
+    python -m benchmarks.pipeline_calls --jobs 200 --applicants 50
+
+Once resume and job features are cached, ranking must not parse anything.
+Title and name enrichment is opt-in, parses a text at most once and never
+again once it is cached. The process exits with status 1 when any stage
+goes over its budget, so it can gate changes to the ranking path.
+"""
+import argparse
+import json
+import os
+import sys
+from contextlib import contextmanager
+from spacy.language import Language
+from benchmarks import isolated_cache
+from benchmarks.synthetic import generate
+
+# Allowed spaCy documents processed per ranked item, per stage
+BUDGETS = {
+    "rank_jds": 0,
+    "rank_candidates": 0,
+    "rank_jds_enriched": 0,  # job titles need no parse
+    "rank_candidates_enriched_cold": 1,
+    "rank_candidates_enriched_cached": 0,
+}
+
+
+class PipelineCounter:
+    """Counts documents run through any spaCy pipeline, by nlp(text) or nlp.pipe(texts)"""
+
+    def __init__(self):
+        self.docs = 0
+
+    @contextmanager
+    def counting(self):
+        call, pipe = Language.__call__, Language.pipe
+        counter = self
+
+        def counted_call(nlp, *args, **kwargs):
+            counter.docs += 1
+            return call(nlp, *args, **kwargs)
+
+        def counted_pipe(nlp, *args, **kwargs):
+            for doc in pipe(nlp, *args, **kwargs):
+                counter.docs += 1
+                yield doc
+
+        Language.__call__, Language.pipe = counted_call, counted_pipe
+        try:
+            yield self
+        finally:
+            Language.__call__, Language.pipe = call, pipe
+
+def run(jobs, applicants, queries=3, seed=0, data_dir=None):
+    """Documents parsed per ranked item for every ranking path, with the budget each is held to"""
+    # Imported here so main() can point FEATURE_CACHE_DIR at a fresh directory first
+    from model.jdsrec import rank_jds
+    from model.jobsrec import rank_candidates
+    from model.resumes import FEATURE_CACHE_DIR, get_resume_features_batch
+    from model.scoring import stream_job_features
+    from model.skills import SKILL_DATABASE
+
+    job_list, applicant_list = generate(
+        data_dir or os.path.join(FEATURE_CACHE_DIR, "data"), jobs, applicants, SKILL_DATABASE, seed
+    )
+    counter = PipelineCounter()
+    results = {}
+
+    def measure(stage, items, rank):
+        with counter.counting():
+            start = counter.docs
+            rank()
+            parsed = counter.docs - start
+        results[stage] = {
+            "docs": parsed,
+            "items": items,
+            "per_item": parsed / max(items, 1),
+            "budget": BUDGETS[stage],
+        }
+
+    # Warm the feature caches; this is the only place documents should be parsed
+    job_features = list(stream_job_features(job["description"] for job in job_list))
+    get_resume_features_batch([applicant["resume_path"] for applicant in applicant_list])
+    job_inputs = [
+        {"id": job["id"], "description": job["description"], "features": features}
+        for job, features in zip(job_list, job_features)
+    ]
+
+    queried = applicant_list[:queries]
+    measure("rank_jds", len(queried) * len(job_inputs), lambda: [
+        rank_jds(applicant["resume_path"], job_inputs) for applicant in queried
+    ])
+    measure("rank_jds_enriched", len(queried) * len(job_inputs), lambda: [
+        rank_jds(applicant["resume_path"], job_inputs, enrich=True) for applicant in queried
+    ])
+    measure("rank_candidates", len(applicant_list), lambda: rank_candidates(
+        applicant_list, None, job_features[0], workers=1
+    ))
+    measure("rank_candidates_enriched_cold", len(applicant_list), lambda: rank_candidates(
+        applicant_list, None, job_features[0], workers=1, enrich=True
+    ))
+    measure("rank_candidates_enriched_cached", len(applicant_list), lambda: rank_candidates(
+        applicant_list, None, job_features[0], workers=1, enrich=True
+    ))
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Count spaCy pipeline invocations per ranked item")
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--applicants", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=3, help="applicants ranked against every job")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", help="where the synthetic resumes are written")
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    parser.add_argument("--keep", action="store_true", help="keep the generated data and caches")
+    args = parser.parse_args(argv)
+
+    with isolated_cache(args.keep):
+        results = run(args.jobs, args.applicants, args.queries, args.seed, args.data_dir)
+    report = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report)
+    else:
+        print(report)
+
+    over = [stage for stage, result in results.items() if result["per_item"] > result["budget"]]
+    if over:
+        print(f"Over budget: {', '.join(over)}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
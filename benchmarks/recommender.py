@@ -0,0 +1,167 @@
+"""Offline benchmark of every recommender stage on synthetic data.
+
+    python -m benchmarks.recommender --scale medium --output bench.json
+
+Each stage is timed on its own and the process's peak RSS is recorded after
+it, so optimizations can be compared and regressions caught without
+MongoDB or network access. Feature caches and the embedding stores go to a
+fresh temporary directory, removed afterwards unless --keep is passed, so
+every run starts cold. The spaCy and SBERT models must already be installed
+locally.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import time
+from contextlib import contextmanager
+import numpy as np
+from benchmarks import isolated_cache
+from benchmarks.synthetic import generate
+
+# (jobs, applicants) per preset; --jobs and --applicants override either
+SCALES = {
+    "small": (10, 10),
+    "medium": (1000, 500),
+    "large": (50000, 5000),
+}
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MiB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / (1 << 10)
+
+class StageTimer:
+    """Wall-clock samples per named stage, summarized as JSON-ready dicts"""
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def time(self, name, items=1):
+        stage = self.stages.setdefault(name, {"samples": [], "items": 0})
+        start = time.perf_counter()
+        yield
+        stage["samples"].append(time.perf_counter() - start)
+        stage["items"] += items
+        stage["peak_rss_mb"] = round(peak_rss_mb(), 1)
+
+    def summary(self):
+        summary = {}
+        for name, stage in self.stages.items():
+            samples = np.asarray(stage["samples"])
+            summary[name] = {
+                "calls": len(samples),
+                "items": stage["items"],
+                "total_s": round(float(samples.sum()), 6),
+                "mean_s": round(float(samples.mean()), 6),
+                "p50_s": round(float(np.percentile(samples, 50)), 6),
+                "p95_s": round(float(np.percentile(samples, 95)), 6),
+                "per_item_ms": round(1000 * float(samples.sum()) / max(stage["items"], 1), 4),
+                "peak_rss_mb": stage["peak_rss_mb"],
+            }
+        return summary
+
+def run(jobs, applicants, queries=5, pairs=20, skill_samples=200, seed=0, data_dir=None):
+    """Run every stage once on synthetic data and return the results as a dict"""
+    # Imported here so main() can point FEATURE_CACHE_DIR at a fresh directory first
+    from model.jdsrec import extract_skills, rank_jds
+    from model.jobsrec import rank_candidates
+    from model.registry import get_nlp, get_sentence_model, NER_ONLY, TOKENIZER_ONLY
+    from model.resumes import FEATURE_CACHE_DIR, get_resume_features_batch, read_pdf_resume
+    from model.scoring import calculate_composite_score, stream_job_features
+    from model.skills import SKILL_DATABASE, get_skill_matcher
+
+    timer = StageTimer()
+    data_dir = data_dir or os.path.join(FEATURE_CACHE_DIR, "data")
+
+    with timer.time("generate", jobs + applicants):
+        job_list, applicant_list = generate(data_dir, jobs, applicants, SKILL_DATABASE, seed)
+
+    # Model loading is reported on its own so it does not skew the first stage that needs it
+    with timer.time("load_models"):
+        get_nlp(exclude=NER_ONLY)
+        get_nlp(exclude=TOKENIZER_ONLY)
+        get_sentence_model()
+        get_skill_matcher()
+
+    with timer.time("read_pdf_resume", len(applicant_list)):
+        resume_texts = [read_pdf_resume(applicant["resume_path"]) for applicant in applicant_list]
+
+    descriptions = [job["description"] for job in job_list[:skill_samples]]
+    for description in descriptions:
+        with timer.time("extract_skills"):
+            extract_skills(description)
+
+    with timer.time("job_features", len(job_list)):
+        job_features = list(stream_job_features(job["description"] for job in job_list))
+    job_inputs = [{"id": job["id"], "features": features} for job, features in zip(job_list, job_features)]
+
+    paths = [applicant["resume_path"] for applicant in applicant_list]
+    with timer.time("resume_features_cold", len(paths)):
+        get_resume_features_batch(paths)
+    with timer.time("resume_features_cached", len(paths)):
+        get_resume_features_batch(paths)
+
+    for applicant in applicant_list[:queries]:
+        with timer.time("rank_jds", len(job_inputs)):
+            rank_jds(applicant["resume_path"], job_inputs)
+
+    for features in job_features[:queries]:
+        with timer.time("rank_candidates", len(applicant_list)):
+            rank_candidates(applicant_list, None, features, workers=1)
+
+    rng = np.random.default_rng(seed)
+    for _ in range(pairs if resume_texts and job_list else 0):
+        resume_text = resume_texts[rng.integers(len(resume_texts))]
+        job = job_list[rng.integers(len(job_list))]
+        with timer.time("calculate_composite_score"):
+            calculate_composite_score(resume_text, job["description"])
+
+    return {
+        "config": {
+            "jobs": jobs, "applicants": applicants, "queries": queries, "pairs": pairs,
+            "skill_samples": skill_samples, "seed": seed, "skills": len(SKILL_DATABASE),
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "stages": timer.summary(),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the recommender stages on synthetic data")
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--jobs", type=int, help="number of job descriptions, overrides --scale")
+    parser.add_argument("--applicants", type=int, help="number of PDF resumes, overrides --scale")
+    parser.add_argument("--queries", type=int, default=5, help="rank_jds and rank_candidates calls to time")
+    parser.add_argument("--pairs", type=int, default=20, help="calculate_composite_score calls to time")
+    parser.add_argument("--skill-samples", type=int, default=200, help="extract_skills calls to time")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    parser.add_argument("--keep", action="store_true", help="keep the generated data and caches")
+    args = parser.parse_args(argv)
+
+    jobs, applicants = SCALES[args.scale]
+    with isolated_cache(args.keep):
+        results = run(
+            args.jobs if args.jobs is not None else jobs,
+            args.applicants if args.applicants is not None else applicants,
+            args.queries, args.pairs, args.skill_samples, args.seed,
+        )
+    results["config"]["scale"] = args.scale
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
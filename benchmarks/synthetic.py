@@ -0,0 +1,105 @@
+"""Synthetic resumes and job descriptions for the benchmarks.
+
+Texts are assembled from the compiled skill vocabulary so skill matching,
+experience and education extraction all have something to find. Resumes
+are written as real PDFs so read_pdf_resume is exercised as in production.
+"""
+import os
+import random
+import textwrap
+
+TITLES = [
+    "Data Scientist", "Software Engineer", "Machine Learning Engineer", "Data Analyst", "Backend Developer",
+    "Frontend Developer", "DevOps Engineer", "Product Manager", "Research Scientist", "Cloud Architect",
+]
+DEGREES = ["PhD", "Master's degree", "MBA", "Bachelor's degree", "Associate degree"]
+FIELDS = ["Computer Science", "Statistics", "Mathematics", "Economics", "Electrical Engineering"]
+FILLER = (
+    "collaborate with cross-functional teams to design build and ship reliable products that customers love "
+    "own projects end to end from discovery through launch and iterate quickly on feedback from users "
+    "communicate results clearly to technical and non-technical stakeholders and mentor junior colleagues"
+).split()
+FIRST_NAMES = ["Alex", "Sam", "Jordan", "Taylor", "Morgan", "Casey", "Riley", "Jamie", "Avery", "Quinn"]
+LAST_NAMES = ["Nguyen", "Smith", "Garcia", "Chen", "Patel", "Johnson", "Kim", "Lopez", "Brown", "Davis"]
+
+
+def _sentence(rng, words=18):
+    return " ".join(rng.choice(FILLER) for _ in range(words)).capitalize() + "."
+
+def job_description(rng, skills):
+    """One job description with required skills, experience, education and a preferred qualifications line"""
+    title = rng.choice(TITLES)
+    required = rng.sample(skills, min(len(skills), rng.randint(4, 12)))
+    preferred = rng.sample(skills, min(len(skills), rng.randint(2, 5)))
+    lines = [
+        title,
+        f"We are looking for a {title} to join our team. {_sentence(rng)}",
+        f"Requirements: {rng.randint(1, 10)}+ years of experience with {', '.join(required)}.",
+        f"{rng.choice(DEGREES)} in {rng.choice(FIELDS)} or a related field.",
+        " ".join(_sentence(rng) for _ in range(rng.randint(2, 6))),
+    ]
+    if rng.random() < 0.7:
+        lines.append(f"Preferred qualifications: experience with {', '.join(preferred)}.")
+    return "\n".join(lines)
+
+def resume_text(rng, skills):
+    """One resume with a name, dated experience, a skills section and education"""
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    start = rng.randint(1995, 2022)
+    lines = [name, f"{rng.choice(TITLES)}", "", "Experience"]
+    for _ in range(rng.randint(1, 4)):
+        lines.append(f"{rng.choice(TITLES)}, {start} - {min(start + rng.randint(1, 6), 2025)}")
+        lines.append(_sentence(rng, rng.randint(12, 30)))
+    lines.append(f"{rng.randint(1, 20)} years of experience")
+    lines += ["", "Skills", ", ".join(rng.sample(skills, min(len(skills), rng.randint(5, 25))))]
+    lines += ["", "Education", f"{rng.choice(DEGREES)} in {rng.choice(FIELDS)}, {start - 4}"]
+    return "\n".join(lines)
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def write_pdf(path, text, lines_per_page=60, width=95):
+    """Write text as a minimal PDF, one Helvetica text object per page, no dependencies needed"""
+    lines = [wrapped for line in text.split("\n") for wrapped in (textwrap.wrap(line, width) or [""])]
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once the page objects are numbered
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    page_refs = []
+    for page in pages:
+        stream = "BT /F1 10 Tf 12 TL 50 780 Td " + "".join(f"({_escape(line)}) Tj T* " for line in page) + "ET"
+        stream = stream.encode("latin-1", "replace")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (len(objects))
+        )
+        page_refs.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(page_refs), len(page_refs))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+def generate(directory, jobs, applicants, skills, seed=0):
+    """Job descriptions as {"id", "description"} dicts and applicants as {"id", "resume_path"} dicts"""
+    rng = random.Random(seed)
+    skills = sorted(skills)
+    job_list = [{"id": f"job-{i}", "description": job_description(rng, skills)} for i in range(jobs)]
+    os.makedirs(directory, exist_ok=True)
+    applicant_list = []
+    for i in range(applicants):
+        path = os.path.join(directory, f"resume-{i}.pdf")
+        write_pdf(path, resume_text(rng, skills))
+        applicant_list.append({"id": f"applicant-{i}", "resume_path": path})
+    return job_list, applicant_list
@@ -1,3 +1,31 @@
 import os
 
-MONGODB_URI = os.environ.get("MONGODB_URI")
\ No newline at end of file
+MONGODB_URI = os.environ.get("MONGODB_URI")
+MONGODB_DATABASE = os.environ.get("MONGODB_DATABASE", "job_matching_db")
+MONGODB_MAX_POOL_SIZE = int(os.environ.get("MONGODB_MAX_POOL_SIZE", "50"))
+MONGODB_MIN_POOL_SIZE = int(os.environ.get("MONGODB_MIN_POOL_SIZE", "0"))
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGODB_CONNECT_TIMEOUT_MS = int(os.environ.get("MONGODB_CONNECT_TIMEOUT_MS", "10000"))
+MONGODB_SOCKET_TIMEOUT_MS = int(os.environ.get("MONGODB_SOCKET_TIMEOUT_MS", "30000"))
+# Number of cards loaded per page of an applicant's swipe feed
+FEED_PAGE_SIZE = int(os.environ.get("FEED_PAGE_SIZE", "20"))
+# Background worker queue
+WORKER_POLL_SECONDS = float(os.environ.get("WORKER_POLL_SECONDS", "2"))
+TASK_TIMEOUT_SECONDS = int(os.environ.get("TASK_TIMEOUT_SECONDS", "600"))
+TASK_MAX_ATTEMPTS = int(os.environ.get("TASK_MAX_ATTEMPTS", "3"))
+# A failed task waits TASK_RETRY_SECONDS * 2 ** (attempts - 1) before it is retried, at most TASK_RETRY_MAX_SECONDS
+TASK_RETRY_SECONDS = float(os.environ.get("TASK_RETRY_SECONDS", "30"))
+TASK_RETRY_MAX_SECONDS = float(os.environ.get("TASK_RETRY_MAX_SECONDS", "1800"))
+# Recommendation service; the app ranks in-process unless RECOMMENDER_URL is set
+# (http://host:port or unix:///path/to.sock)
+RECOMMENDER_URL = os.environ.get("RECOMMENDER_URL", "")
+SERVICE_HOST = os.environ.get("SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.environ.get("SERVICE_PORT", "8600"))
+SERVICE_SOCKET = os.environ.get("SERVICE_SOCKET", "")
+SERVICE_MAX_CONCURRENCY = int(os.environ.get("SERVICE_MAX_CONCURRENCY", "4"))
+SERVICE_THREADS = int(os.environ.get("SERVICE_THREADS", "4"))
+# Run rankings in this many worker processes instead of threads when > 0
+SERVICE_PROCESSES = int(os.environ.get("SERVICE_PROCESSES", "0"))
+SERVICE_TIMEOUT_SECONDS = float(os.environ.get("SERVICE_TIMEOUT_SECONDS", "30"))
+# Requests the front end does not wait on only need the service to accept them
+SERVICE_SUBMIT_TIMEOUT_SECONDS = float(os.environ.get("SERVICE_SUBMIT_TIMEOUT_SECONDS", "2"))
\ No newline at end of file
@@ -0,0 +1,63 @@
+import functools
+import pymongo
+from pymongo.server_api import ServerApi
+import constants
+
+# Every query the pages run filters on one of these
+INDEXES = {
+    'users': [
+        ([('id', pymongo.ASCENDING)], {'unique': True}),
+        ([('email', pymongo.ASCENDING)], {'unique': True}),
+    ],
+    'jobs': [
+        ([('id', pymongo.ASCENDING)], {'unique': True}),
+        ([('recruiter_id', pymongo.ASCENDING)], {}),
+        ([('created_at', pymongo.ASCENDING)], {}),
+    ],
+    'applications': [
+        ([('job_id', pymongo.ASCENDING), ('status', pymongo.ASCENDING)], {}),
+        ([('applicant_id', pymongo.ASCENDING), ('job_id', pymongo.ASCENDING)], {}),
+    ],
+    'job_features': [
+        ([('job_id', pymongo.ASCENDING)], {'unique': True}),
+    ],
+    'recommendations': [
+        ([('applicant_id', pymongo.ASCENDING), ('job_id', pymongo.ASCENDING)], {'unique': True}),
+        ([('applicant_id', pymongo.ASCENDING), ('score', pymongo.DESCENDING), ('job_id', pymongo.ASCENDING)], {}),
+    ],
+    'feeds': [
+        ([('applicant_id', pymongo.ASCENDING)], {'unique': True}),
+    ],
+    'tasks': [
+        ([('status', pymongo.ASCENDING), ('created_at', pymongo.ASCENDING)], {}),
+    ],
+}
+
+@functools.lru_cache(maxsize=None)
+def get_client():
+    """One pooled MongoClient per process, reused across Streamlit reruns"""
+    return pymongo.MongoClient(
+        constants.MONGODB_URI,
+        server_api=ServerApi('1'),
+        maxPoolSize=constants.MONGODB_MAX_POOL_SIZE,
+        minPoolSize=constants.MONGODB_MIN_POOL_SIZE,
+        serverSelectionTimeoutMS=constants.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        connectTimeoutMS=constants.MONGODB_CONNECT_TIMEOUT_MS,
+        socketTimeoutMS=constants.MONGODB_SOCKET_TIMEOUT_MS,
+    )
+
+def ensure_indexes(db):
+    """Create the indexes in INDEXES; safe to run repeatedly"""
+    for collection, indexes in INDEXES.items():
+        for keys, options in indexes:
+            try:
+                db[collection].create_index(keys, **options)
+            except pymongo.errors.OperationFailure as e:
+                print(f"Error creating index {keys} on {collection}: {e}")
+
+@functools.lru_cache(maxsize=None)
+def get_database():
+    """Application database, with indexes bootstrapped on first access in this process"""
+    db = get_client()[constants.MONGODB_DATABASE]
+    ensure_indexes(db)
+    return db
@@ -2,23 +2,30 @@ from datetime import datetime
 import time
 import os
 from pathlib import Path
-import constants
 import streamlit as st
 import pymongo
+from database import get_database
 from schema import User, Application, JobPosting
 from streamlit_pdf_viewer import pdf_viewer
-from model.jobsrec import rank_candidates
-from model.jdsrec import rank_jds
-
-def get_database():
-    client = pymongo.MongoClient(constants.MONGODB_URI, server_api=pymongo.server_api.ServerApi('1'))
-    return client['job_matching_db']
+from model.metrics import start_metrics_server, timed, timer
+from model.resumes import extract_resume_text, get_resume_features
+from profiling import PROFILE_ADMINS, profile_rerun
+from recommendations import (
+    feed_current, read_applicant_scores, read_recommendations, resume_digest, save_job_features
+)
+from service_client import ServiceError, ServiceUnavailable, get_ranking_client
+from worker import enqueue
 
 #init db
 db = get_database()
 users_collection = db['users']
 jobs_collection = db['jobs']
 applications_collection = db['applications']
+#stage timings endpoint, only when METRICS_ENABLED and METRICS_PORT are set
+start_metrics_server()
+#the ranking service when RECOMMENDER_URL is set, the background worker otherwise;
+#pages only ever ask it for work and never wait on ranking
+ranker = get_ranking_client()
 
 def login_page():
     st.title("JobSwipe 🪄: Job AI- Matching Platform")
@@ -30,7 +37,8 @@ def login_page():
         role = st.selectbox("Role", ["recruiter", "applicant"])
         
         if st.form_submit_button("Login"):
-            user = users_collection.find_one({'email': email, 'password': password, 'role': role})
+            with timer('mongo.users.find_one'):
+                user = users_collection.find_one({'email': email, 'password': password, 'role': role})
             if user:
                 st.session_state['user'] = user
                 st.session_state['logged_in'] = True
@@ -47,13 +55,15 @@ def login_page():
                 return
             user = User(email, password, role)
             try:
-                users_collection.insert_one(user.to_dict())
+                with timer('mongo.users.insert_one'):
+                    users_collection.insert_one(user.to_dict())
             except pymongo.errors.DuplicateKeyError:
                 st.error("Email already exists")
                 return
             st.success("Account created successfully!")
 
 def save_uploaded_file(uploaded_file):
+    #path of the saved upload and, for a pdf, its content digest
     if uploaded_file is not None:
         #save uploaded file to a folder
         file_path = Path("uploads") / uploaded_file.name
@@ -61,49 +71,87 @@ def save_uploaded_file(uploaded_file):
         
         with open(file_path, "wb") as f:
             f.write(uploaded_file.getbuffer())
-        return str(file_path)
-    return None
-
-def get_recommended_jobs(user):
+        #extract the text once now so ranking never opens the pdf again
+        digest = None
+        if file_path.suffix.lower() == '.pdf':
+            digest = extract_resume_text(file_path)
+        return str(file_path), digest
+    return None, None
+
+@timed('page.get_recommended_jobs')
+def get_recommended_jobs(user, cursor=None):
+    #one page of job cards, the cursor of the next page (None when this is the last one)
+    #and whether the feed is still being prepared for the current resume
     print('start recommend jobs')
     resume_path = user["profile"].get('resume_path')
     recommended_jobs = []
     #if user has a resume, use it to get recommended jobs
     if resume_path is None:
-        return recommended_jobs
-    
-    #get all jobs + join jobs with recruiter
-    jobs = list(jobs_collection.find())
-
-    jobs_dict = {}
-    job_model_inputs = []
-    for job in jobs:
-        is_apply = applications_collection.find_one({'job_id': job['id'], 'applicant_id': user['id']})
-        print(is_apply)
-        if is_apply is None:
-            jobs_dict[job['id']] = job
-            job_model_inputs.append({
-                "id": job["id"],
-                "description": job["description"],
-            })
-
-    #MODEL CALLING
-    jobs_rank_list = rank_jds(resume_path, job_model_inputs)
+        return recommended_jobs, None, False
+
+    #jobs the user already applied to, in one round trip instead of one per job
+    with timer('mongo.applications.distinct'):
+        applied_job_ids = applications_collection.distinct('job_id', {'applicant_id': user['id']})
+
+    #feed materialized in the background, the page only reads it; if it is not current for this
+    #resume yet, the ranker is asked to catch up and whatever is persisted is shown meanwhile
+    preparing = False
+    if cursor is None:
+        with timer('mongo.feeds.find_one'):
+            preparing = not feed_current(user['id'], resume_digest(user['profile']))
+        if preparing:
+            try:
+                ranker.request_feed(user['id'])
+            except (ServiceUnavailable, ServiceError) as e:
+                print(f"Error requesting the feed of {user['id']}: {str(e)}")
+    with timer('mongo.recommendations.find'):
+        rows, next_cursor = read_recommendations(user['id'], applied_job_ids, cursor=cursor)
+    jobs_rank_list = [{"id": row["job_id"], "score": row["score"]} for row in rows]
+
+    #ranked jobs joined with their recruiter, projected to the fields the feed shows
+    with timer('mongo.jobs.aggregate'):
+        jobs = list(jobs_collection.aggregate([
+            {
+                "$match": {"id": {"$in": [result["id"] for result in jobs_rank_list]}}
+            },
+            {
+                "$lookup": {
+                    "from": "users",
+                    "localField": "recruiter_id",
+                    "foreignField": "id",
+                    "as": "recruiter"
+                }
+            },
+            {
+                "$project": {
+                    "_id": 0,
+                    "id": 1,
+                    "title": 1,
+                    "description": 1,
+                    "questions": 1,
+                    "company_name": {"$arrayElemAt": ["$recruiter.profile.company_name", 0]},
+                    "company_description": {"$arrayElemAt": ["$recruiter.profile.company_description", 0]},
+                    "company_location": {"$arrayElemAt": ["$recruiter.profile.company_location", 0]},
+                }
+            }
+        ]))
+    jobs_dict = {job['id']: job for job in jobs}
 
     for result in jobs_rank_list:
-        job = jobs_dict[result["id"]]
-        recruiter = users_collection.find_one({'id': job["recruiter_id"]})
+        job = jobs_dict.get(result["id"])
+        if job is None:
+            continue
         recommended_jobs.append({
             "id": job["id"],
-            "company_name": recruiter["profile"]["company_name"],
-            "company_description": recruiter["profile"]["company_description"],
-            "company_location": recruiter["profile"]["company_location"],
+            "company_name": job.get("company_name"),
+            "company_description": job.get("company_description"),
+            "company_location": job.get("company_location"),
             "title": job["title"],
             "description": job["description"],
             "questions": job["questions"],
             "score": result["score"]
         })
-    return recommended_jobs
+    return recommended_jobs, next_cursor, preparing
     #return placeholder jobs
     # return [
     #     {
@@ -126,17 +174,38 @@ def get_recommended_jobs(user):
     #     }
     # ]
 
+def load_job_page(cursor=None):
+    #keep only the current page of cards in the session, starting from its first card;
+    #a page whose rows all dropped out (jobs since deleted) is skipped, so it cannot end the feed early
+    jobs, next_cursor, preparing = get_recommended_jobs(st.session_state['user'], cursor)
+    while not jobs and next_cursor is not None:
+        jobs, next_cursor, _ = get_recommended_jobs(st.session_state['user'], next_cursor)
+    st.session_state['recommended_jobs'] = jobs
+    st.session_state['job_feed_cursor'] = next_cursor
+    st.session_state['current_job_index'] = 0
+    if cursor is None:
+        st.session_state['job_feed_preparing'] = preparing
+
 def job_page():
     st.title("Find Your Next Job")
     if 'recommended_jobs' not in st.session_state:
-        st.session_state['recommended_jobs'] = get_recommended_jobs(st.session_state['user'])
-        st.session_state['current_job_index'] = 0
+        load_job_page()
+
+    #the next page is fetched once every card of this one has been swiped
+    if (st.session_state['current_job_index'] >= len(st.session_state['recommended_jobs'])
+            and st.session_state['job_feed_cursor'] is not None):
+        load_job_page(st.session_state['job_feed_cursor'])
 
     if st.session_state['current_job_index'] >= len(st.session_state['recommended_jobs']):
+        if st.session_state.get('job_feed_preparing'):
+            st.info("We are preparing job recommendations for your resume, check back in a moment.")
+            if st.button("Refresh"):
+                load_job_page()
+                st.rerun()
+            return
         st.write("No more jobs to show!")
         if st.button("Start Over"):
-            st.session_state['recommended_jobs'] = get_recommended_jobs(st.session_state['user'])
-            st.session_state['current_job_index'] = 0
+            load_job_page()
             st.rerun()
         return
 
@@ -175,7 +244,8 @@ def job_page():
         if st.button("👍 Apply"):
             if len(current_job['questions']) == 0:
                 application = Application(current_job['id'], st.session_state['user']['id'], [])
-                applications_collection.insert_one(application.to_dict())
+                with timer('mongo.applications.insert_one'):
+                    applications_collection.insert_one(application.to_dict())
                 st.session_state['current_job_index'] += 1
                 st.success("Application submitted!")
                 st.rerun()
@@ -206,7 +276,8 @@ def job_page():
                 st.session_state['user_response'] = user_inputs  # Store response
                 st.session_state['show_modal'] = False  # Close modal
                 application = Application(current_job['id'], st.session_state['user']['id'], user_inputs)
-                applications_collection.insert_one(application.to_dict())
+                with timer('mongo.applications.insert_one'):
+                    applications_collection.insert_one(application.to_dict())
                 st.session_state['current_job_index'] += 1
                 st.success("Application submitted!")
                 st.rerun()
@@ -235,7 +306,11 @@ def profile_setup_page():
             }
         
         if st.form_submit_button("Save Profile"):
-            resume_path = save_uploaded_file(resume) if resume else None
+            resume_path, digest = save_uploaded_file(resume) if resume else (None, None)
+            resume_features = None
+            if resume_path:
+                #precompute resume features so ranking reads them from the store
+                resume_features = get_resume_features(resume_path, digest)
             #mongodb only accept datetime objs
             dob_formatted = datetime(dob.year, dob.month, dob.day)
             
@@ -250,6 +325,7 @@ def profile_setup_page():
             if st.session_state['user']['role'] == 'applicant':
                 profile_data.update({
                     'resume_path': resume_path,
+                    'resume_digest': resume_features['digest'] if resume_features else None,
                     **profile_fields,
                 })
                 st.session_state['user']["profile"] = profile_data
@@ -257,10 +333,13 @@ def profile_setup_page():
                 profile_data.update(profile_fields)
             
             #add profile to database
-            users_collection.update_one(
-                {'_id': st.session_state['user']['_id']},
-                {'$set': {'profile': profile_data}}
-            )
+            with timer('mongo.users.update_one'):
+                users_collection.update_one(
+                    {'_id': st.session_state['user']['_id']},
+                    {'$set': {'profile': profile_data}}
+                )
+            if resume_path:
+                enqueue('resume_uploaded', {'applicant_id': st.session_state['user']['id']})
                   
             st.session_state['profile_complete'] = True
             st.success("Profile saved successfully!")
@@ -324,7 +403,11 @@ def recruiter_job_post():
                 recruiter_id=st.session_state['user']['id'],
                 questions=updated_questions
             )
-            jobs_collection.insert_one(job.to_dict())
+            with timer('mongo.jobs.insert_one'):
+                jobs_collection.insert_one(job.to_dict())
+            #only the embedding store is appended to here, the worker extends the search graph
+            save_job_features([job.to_dict()], sync_graph=False)
+            enqueue('job_posted', {'job_id': job.id})
             
             # Reset questions
             st.session_state.job_questions = []
@@ -342,19 +425,20 @@ def application_status_page():
     st.title("Application Status 📝")
     st.write("Check the status of your applications here.")
     # Perform the aggregation pipeline to join jobs_collection
-    applications = applications_collection.aggregate([
-        {
-            "$match": {"applicant_id": st.session_state['user']['id']}
-        },
-        {
-            "$lookup": {
-                "from": "jobs",  # The collection to join with
-                "localField": "job_id",     # Field in applications_collection
-                "foreignField": "id",       # Matching field in jobs_collection
-                "as": "job_details"         # Output array containing job details
+    with timer('mongo.applications.aggregate'):
+        applications = list(applications_collection.aggregate([
+            {
+                "$match": {"applicant_id": st.session_state['user']['id']}
+            },
+            {
+                "$lookup": {
+                    "from": "jobs",  # The collection to join with
+                    "localField": "job_id",     # Field in applications_collection
+                    "foreignField": "id",       # Matching field in jobs_collection
+                    "as": "job_details"         # Output array containing job details
+                }
             }
-        }
-    ])
+        ]))
 
     for application in applications:
         job_details = application.get("job_details", [])
@@ -378,7 +462,9 @@ def application_status_page():
             if application_date else "Unknown Date"
         )
 
-        company_name = users_collection.find_one({"id": job["recruiter_id"]}).get("profile", {}).get("company_name", "Unknown Company")
+        with timer('mongo.users.find_one'):
+            recruiter = users_collection.find_one({"id": job["recruiter_id"]})
+        company_name = recruiter.get("profile", {}).get("company_name", "Unknown Company")
 
         with st.container():
             st.markdown(
@@ -404,43 +490,51 @@ def application_status_page():
                 unsafe_allow_html=True
             )
 
+@timed('page.get_recommended_applicants')
 def get_recommended_applicants(user):
     print('start recommendation applicants')
     recommended_applicants = []
-    job = jobs_collection.find_one({'recruiter_id': user['id']})
+    with timer('mongo.jobs.find_one'):
+        job = jobs_collection.find_one({'recruiter_id': user['id']})
     if job is None:
         return []
-    applications_db = applications_collection.aggregate([
-        {
-            "$match": {"job_id": job['id'], "status": "pending"}
-        },
-        {
-            "$lookup": {
-                "from": "users",  # The collection to join with
-                "localField": "applicant_id",     # Field in applications_collection
-                "foreignField": "id",       # Matching field in jobs_collection
-                "as": "applicant_details"         # Output array containing job details
+    with timer('mongo.applications.aggregate'):
+        applications_db = list(applications_collection.aggregate([
+            {
+                "$match": {"job_id": job['id'], "status": "pending"}
+            },
+            {
+                "$lookup": {
+                    "from": "users",  # The collection to join with
+                    "localField": "applicant_id",     # Field in applications_collection
+                    "foreignField": "id",       # Matching field in jobs_collection
+                    "as": "applicant_details"         # Output array containing job details
+                }
             }
-        }
-    ])
-    if applications_db is None:
-        return []
+        ]))
     
-    applications_db = list(applications_db) #convert cursor to list
     # for application in applications_db:
     #     print(application)
     #     print(application["id"])
     #     print(application["answers"])
     #     print(application["applicant_details"][0]["profile"]["resume_path"])
     # preparing model inputs
-    application_json = {application["id"]: application for application in applications_db}
+    application_json = {application["applicant_id"]: application for application in applications_db}
     apps_model_inputs = [{
-        "id": application["id"],
-        "answers": application["answers"],
+        "id": application["applicant_id"],
         "resume_path": application["applicant_details"][0]["profile"]["resume_path"],
+        "resume_digest": resume_digest(application["applicant_details"][0]["profile"]),
     } for application in applications_db]
-    #Call job matching api
-    apps_rank_list = rank_candidates(apps_model_inputs, job["description"])
+    #persisted scores, best first; applicants without one for their current resume are scored in the
+    #background and listed after them unscored until the next load
+    with timer('mongo.recommendations.find'):
+        apps_rank_list, unscored = read_applicant_scores(job['id'], apps_model_inputs)
+    if unscored:
+        try:
+            ranker.request_scores(job['id'], unscored)
+        except (ServiceUnavailable, ServiceError) as e:
+            print(f"Error requesting applicant scores for {job['id']}: {str(e)}")
+        apps_rank_list += [{"id": applicant["id"], "score": None} for applicant in unscored]
     for result in apps_rank_list:
         application = application_json[result["id"]]
         recommended_applicants.append({
@@ -495,26 +589,29 @@ def recruiter_applications():
 
     with col3:
         if st.button("👎 Reject"):
-            applications_collection.update_one(
-                {'id': current_app['id']},
-                {'$set': {'status': 'rejected'}}
-            )
+            with timer('mongo.applications.update_one'):
+                applications_collection.update_one(
+                    {'id': current_app['id']},
+                    {'$set': {'status': 'rejected'}}
+                )
             st.session_state['current_app_index'] += 1
             st.rerun()
 
     with col4:
         if st.button("👍 Accept"):
-            applications_collection.update_one(
-                {'id': current_app['id']},
-                {'$set': {'status': 'accepted'}}
-            )
+            with timer('mongo.applications.update_one'):
+                applications_collection.update_one(
+                    {'id': current_app['id']},
+                    {'$set': {'status': 'accepted'}}
+                )
             st.session_state['current_app_index'] += 1
             st.rerun()
 
     # Create a two-column layout
     col1, col2 = st.columns([2, 3])  # Left: Applicant details, Right: Resume PDF
 
-    job = jobs_collection.find_one({'recruiter_id': st.session_state['user']['id']})
+    with timer('mongo.jobs.find_one'):
+        job = jobs_collection.find_one({'recruiter_id': st.session_state['user']['id']})
     with col1:
         st.header("👤 Job Information")
         st.write(f"**Job Title:** {job['title']}")
@@ -524,7 +621,10 @@ def recruiter_applications():
         st.write(f"**Name:** {current_app.get('profile', {}).get('name', 'Unknown')}")
         st.write(f"**Education:** {current_app.get('profile',{}).get('education', 'Not specified')}")
         st.write(f"**Years of Experience:** {current_app.get('profile',{}).get('experience_years', 'N/A')} years")
-        st.write(f"**Matching Score:** {round(current_app.get('score', 'N/A') * 100, 2)}%")
+        if current_app.get('score') is None:
+            st.write("**Matching Score:** still being scored")
+        else:
+            st.write(f"**Matching Score:** {round(current_app['score'] * 100, 2)}%")
         for question, answer in zip(job['questions'], current_app['answers']):
             st.write(f"**{question}**: {answer}")
 
@@ -539,15 +639,15 @@ def recruiter_applications():
         else:
             st.warning("No resume available.")
 
-def main():
-    st.set_page_config(layout="wide")
-    if 'show_details' not in st.session_state:
-        st.session_state['show_details'] = False
-    if 'show_modal' not in st.session_state:
-        st.session_state['show_modal'] = False
-    if 'logged_in' not in st.session_state:
-        st.session_state['logged_in'] = False
-    
+def current_page():
+    #name of the view this rerun renders, used to tag profiles
+    if not st.session_state['logged_in']:
+        return 'login'
+    if not st.session_state["profile_complete"]:
+        return 'profile_setup'
+    return f"{st.session_state['user']['role']}_home"
+
+def render_page():
     if not st.session_state['logged_in']:
         login_page()
     else:
@@ -568,5 +668,23 @@ def main():
                 with tab2:
                     recruiter_applications()
 
+def main():
+    st.set_page_config(layout="wide")
+    if 'show_details' not in st.session_state:
+        st.session_state['show_details'] = False
+    if 'show_modal' not in st.session_state:
+        st.session_state['show_modal'] = False
+    if 'logged_in' not in st.session_state:
+        st.session_state['logged_in'] = False
+
+    #admins can profile a single rerun with ?profile=1, rate limited like PROFILE_RERUNS
+    user = st.session_state.get('user') if st.session_state['logged_in'] else None
+    requested = (
+        st.query_params.get('profile') == '1'
+        and user is not None and user.get('email') in PROFILE_ADMINS
+    )
+    with profile_rerun(current_page(), user['role'] if user else 'anonymous', requested):
+        render_page()
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
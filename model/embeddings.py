@@ -0,0 +1,153 @@
+import os
+import threading
+import numpy as np
+from model.metrics import timed
+from model.registry import EMBEDDING_DIM
+
+try:
+    import fcntl
+except ImportError:  # appends are only serialized within one process
+    fcntl = None
+
+# Storage type of stored embeddings: float32, float16 (half the size) or int8 (a quarter)
+EMBEDDING_DTYPE = os.environ.get("EMBEDDING_DTYPE", "float32")
+_INT8_SCALE = 127.0
+
+
+def normalize_rows(vectors):
+    """Scale vectors to unit length along the last axis, leaving all-zero vectors as they are"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+class EmbeddingStore:
+    """Append-only matrix of unit-length embeddings in a memory-mapped file.
+
+    Rows live in ``<path>.<dtype>.vec`` and their ids, one per line, in
+    ``<path>.<dtype>.ids``. Adding an id again appends a new row that
+    supersedes the old one. Every process maps the same file read-only, so
+    the vectors are shared through the page cache and rows appended by one
+    process are picked up by the others on their next read.
+    """
+
+    def __init__(self, path, dim=EMBEDDING_DIM, dtype=EMBEDDING_DTYPE):
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in (np.float32, np.float16, np.int8):
+            raise ValueError(f"Unsupported embedding dtype {dtype}")
+        self.dim = dim
+        self.vectors_path = f"{path}.{self.dtype.name}.vec"
+        self.ids_path = f"{path}.{self.dtype.name}.ids"
+        self.ids = []
+        self.rows = {}
+        self._ids_offset = 0
+        self._matrix = np.zeros((0, dim), dtype=self.dtype)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        self.refresh()
+        return len(self.rows)
+
+    def __contains__(self, key):
+        self.refresh()
+        return key in self.rows
+
+    @property
+    def row_count(self):
+        """Rows in the file, superseded ones included"""
+        return len(self.ids)
+
+    def refresh(self):
+        """Pick up rows appended by this or another process since the last read"""
+        try:
+            size = os.path.getsize(self.ids_path)
+        except FileNotFoundError:
+            return
+        if size != self._ids_offset:
+            with self._lock:
+                self._refresh_locked()
+
+    def _refresh_locked(self):
+        try:
+            with open(self.ids_path, "rb") as f:
+                f.seek(self._ids_offset)
+                chunk = f.read()
+        except FileNotFoundError:
+            return
+        # A writer may be halfway through a line; it is read on the next refresh
+        end = chunk.rfind(b"\n") + 1
+        if not end:
+            return
+        for key in chunk[:end].decode("utf-8").splitlines():
+            self.rows[key] = len(self.ids)
+            self.ids.append(key)
+        self._ids_offset += end
+        self._matrix = np.memmap(self.vectors_path, dtype=self.dtype, mode="r", shape=(len(self.ids), self.dim))
+
+    def _quantize(self, vectors):
+        if self.dtype == np.int8:
+            return np.clip(np.rint(vectors * _INT8_SCALE), -_INT8_SCALE, _INT8_SCALE).astype(np.int8)
+        return vectors.astype(self.dtype)
+
+    def _dot(self, matrix, query):
+        scores = np.asarray(matrix @ query, dtype=np.float32)
+        return scores / _INT8_SCALE if self.dtype == np.int8 else scores
+
+    def add(self, keys, embeddings):
+        """Append the embeddings of some ids, replacing any earlier rows for them"""
+        keys = list(keys)
+        if not keys:
+            return
+        vectors = self._quantize(normalize_rows(embeddings).reshape(-1, self.dim))
+        os.makedirs(os.path.dirname(self.ids_path) or ".", exist_ok=True)
+        with self._lock, open(self.ids_path, "ab") as ids_file:
+            if fcntl is not None:
+                fcntl.flock(ids_file, fcntl.LOCK_EX)  # released when the file is closed
+            self._refresh_locked()
+            with open(self.vectors_path, "ab") as f:
+                # Drop rows left behind by a writer that died before recording their ids
+                row_bytes = self.dim * self.dtype.itemsize
+                if f.tell() > len(self.ids) * row_bytes:
+                    f.truncate(len(self.ids) * row_bytes)
+                f.write(vectors.tobytes())
+            # Ids are written last so a reader never sees an id without its row
+            ids_file.write("".join(f"{key}\n" for key in keys).encode("utf-8"))
+            ids_file.flush()
+            self._refresh_locked()
+
+    def get(self, key):
+        """The stored embedding of an id as float32, or None"""
+        self.refresh()
+        with self._lock:
+            row = self.rows.get(key)
+            matrix = self._matrix
+        if row is None:
+            return None
+        vector = matrix[row].astype(np.float32)
+        return vector / _INT8_SCALE if self.dtype == np.int8 else vector
+
+    @timed("embedding_similarities")
+    def similarities(self, embedding, keys):
+        """Cosine similarity of an embedding against the stored rows of some ids, NaN where an id is missing
+
+        Consecutive rows are compared through a view of the mapped file; any
+        other selection copies just the requested rows.
+        """
+        self.refresh()
+        query = normalize_rows(embedding).reshape(self.dim)
+        with self._lock:
+            rows = np.fromiter((self.rows.get(key, -1) for key in keys), dtype=np.int64)
+            matrix = self._matrix
+        scores = np.full(len(rows), np.nan, dtype=np.float32)
+        found = rows >= 0
+        if found.any():
+            selected = rows[found]
+            if (np.diff(selected) == 1).all():
+                scores[found] = self._dot(matrix[selected[0]:selected[-1] + 1], query)
+            else:
+                scores[found] = self._dot(matrix[selected], query)
+        return scores
+
+    def matrix(self):
+        """Read-only view of every row, superseded ones included, as stored"""
+        self.refresh()
+        return self._matrix
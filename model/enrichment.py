@@ -0,0 +1,73 @@
+import hashlib
+import os
+from model.metrics import timed
+from model.registry import get_nlp, NER_ONLY
+from model.resumes import FEATURE_CACHE_DIR
+
+# Names are looked for near the top of a resume only
+NAME_SEARCH_CHARS = 300
+# A first line longer than this is prose, not a title
+MAX_TITLE_WORDS = 10
+_MISSING = object()
+
+
+def text_digest(text):
+    """SHA-256 of a text, the cache key of everything derived from it"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class EnrichmentCache:
+    """Display values derived from resume and job texts, persisted on disk by kind and text digest.
+
+    An empty file records that nothing was found, so misses are not recomputed either.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = os.path.join(directory or FEATURE_CACHE_DIR, "enrichment")
+
+    def _path(self, kind, digest):
+        return os.path.join(self.directory, f"{kind}-{digest}.txt")
+
+    def get(self, kind, digest):
+        try:
+            with open(self._path(kind, digest), encoding="utf-8") as f:
+                return f.read() or None
+        except FileNotFoundError:
+            return _MISSING
+
+    def put(self, kind, digest, value):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{self._path(kind, digest)}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(value or "")
+        os.replace(tmp_path, self._path(kind, digest))
+
+    def load(self, kind, text, extract):
+        """Cached extract(text), computed and stored on the first request"""
+        digest = text_digest(text)
+        value = self.get(kind, digest)
+        if value is _MISSING:
+            value = extract(text)
+            self.put(kind, digest, value)
+        return value
+
+enrichment_cache = EnrichmentCache()
+
+def _extract_name(text):
+    # The first PERSON entity near the top of the resume, parsed with NER only
+    doc = get_nlp(exclude=NER_ONLY)(text[:NAME_SEARCH_CHARS])
+    return next((ent.text for ent in doc.ents if ent.label_ == "PERSON"), None)
+
+def _extract_title(text):
+    # en_core_web_lg has no JOB_TITLE entity; postings lead with their title instead
+    first_line = next((line.strip() for line in text.split("\n") if line.strip()), "")
+    return first_line if 0 < len(first_line.split()) <= MAX_TITLE_WORDS else None
+
+@timed("enrich_name")
+def candidate_name(resume_text):
+    """Candidate name from a resume's text, or None; parsed once per distinct text"""
+    return enrichment_cache.load("name", resume_text, _extract_name)
+
+@timed("enrich_title")
+def job_title(job_text):
+    """Job title from a job description, or None; derived once per distinct text"""
+    return enrichment_cache.load("title", job_text, _extract_title)
@@ -0,0 +1,163 @@
+import os
+import threading
+import numpy as np
+from model.embeddings import EmbeddingStore, normalize_rows
+from model.metrics import timed
+from model.registry import EMBEDDING_DIM
+from model.resumes import FEATURE_CACHE_DIR
+
+try:
+    import hnswlib
+except ImportError:  # exact search only
+    hnswlib = None
+
+JOB_INDEX_PATH = os.environ.get("JOB_INDEX_PATH", os.path.join(FEATURE_CACHE_DIR, "jobs_index"))
+# Number of jobs shortlisted by embedding similarity before full composite scoring
+RETRIEVAL_K = int(os.environ.get("RETRIEVAL_K", "200"))
+# Catalogs up to this size are searched exactly; larger ones go through HNSW when available
+EXACT_SEARCH_LIMIT = int(os.environ.get("EXACT_SEARCH_LIMIT", "5000"))
+
+
+class JobIndex:
+    """Cosine-similarity index over job embeddings, persisted to disk.
+
+    Vectors live in a memory-mapped EmbeddingStore shared by every process,
+    so small catalogs are searched exactly; an HNSW graph is built on top
+    once the catalog outgrows EXACT_SEARCH_LIMIT. Graph labels are store rows.
+    The graph is only loaded, built or extended by processes that search or
+    add with sync_graph, so pages that just post jobs never pay for it.
+    """
+
+    def __init__(self, path=JOB_INDEX_PATH, dim=EMBEDDING_DIM):
+        self.path = path
+        self.dim = dim
+        self.store = EmbeddingStore(path, dim)
+        self.hnsw = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.store)
+
+    def __contains__(self, job_id):
+        return job_id in self.store
+
+    def add(self, job_ids, embeddings, sync_graph=True):
+        """Add or replace the embeddings of some jobs; without sync_graph only the store is appended to"""
+        self.store.add(job_ids, embeddings)
+        if sync_graph:
+            with self._lock:
+                self._sync_hnsw()
+
+    def sync_graph(self):
+        """Bring the HNSW graph up to date with the store; returns whether it changed and is worth saving"""
+        self.store.refresh()
+        with self._lock:
+            return self._sync_hnsw()
+
+    def _sync_hnsw(self):
+        # Rows are only ever appended, so the graph is behind by a suffix of them
+        if self.hnsw is None:
+            if hnswlib is None or len(self.store) <= EXACT_SEARCH_LIMIT:
+                return False
+            self.hnsw = self._load_hnsw()
+            if self.hnsw is None:
+                self._build_hnsw()
+                return True
+        count = self.store.row_count
+        added = self.hnsw.get_current_count()
+        if added >= count:
+            return False
+        if count > self.hnsw.get_max_elements():
+            self.hnsw.resize_index(count * 2)
+        self.hnsw.add_items(self._rows(added, count), np.arange(added, count))
+        return True
+
+    def _rows(self, start, stop):
+        rows = np.asarray(self.store.matrix()[start:stop], dtype=np.float32)
+        return normalize_rows(rows)
+
+    def _load_hnsw(self):
+        # The saved graph, or None when there is none or it cannot be used
+        path = f"{self.path}.hnsw"
+        if not os.path.exists(path):
+            return None
+        try:
+            hnsw = hnswlib.Index(space="ip", dim=self.dim)
+            hnsw.load_index(path, max_elements=self.store.row_count * 2)
+        except (RuntimeError, OSError) as e:
+            print(f"Error loading {path}, rebuilding it from the embedding store: {str(e)}")
+            return None
+        # A graph saved against rows this store does not have cannot be extended
+        return hnsw if hnsw.get_current_count() <= self.store.row_count else None
+
+    def _build_hnsw(self):
+        count = self.store.row_count
+        self.hnsw = hnswlib.Index(space="ip", dim=self.dim)
+        self.hnsw.init_index(max_elements=max(count * 2, 1024), ef_construction=200, M=16)
+        self.hnsw.add_items(self._rows(0, count), np.arange(count))
+
+    @timed("index_search")
+    def search(self, embedding, k=RETRIEVAL_K, job_ids=None):
+        """Ids of the k jobs most similar to an embedding, restricted to job_ids if given"""
+        store = self.store
+        store.refresh()
+        with self._lock:
+            self._sync_hnsw()
+            hnsw = self.hnsw
+        if job_ids is None:
+            candidates = list(store.rows)
+        else:
+            candidates = [job_id for job_id in dict.fromkeys(job_ids) if job_id in store.rows]
+        k = min(k, len(candidates))
+        if k == 0:
+            return []
+        # Small candidate sets are cheaper to scan than to filter out of the graph
+        if hnsw is not None and len(candidates) > EXACT_SEARCH_LIMIT:
+            # Only the latest row of each job may be returned
+            allowed = {store.rows[job_id] for job_id in candidates}
+            query = normalize_rows(embedding).reshape(self.dim)
+            try:
+                with self._lock:
+                    hnsw.set_ef(max(k * 2, 50))
+                    labels, _ = hnsw.knn_query(query, k=k, filter=allowed.__contains__)
+                return [store.ids[row] for row in labels[0]]
+            except RuntimeError:
+                # hnswlib raises when the filter leaves fewer than k reachable items
+                pass
+        scores = store.similarities(embedding, candidates)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [candidates[i] for i in top]
+
+    def save(self):
+        """Persist the HNSW graph, if this process has one; the store writes its rows as they are added"""
+        with self._lock:
+            if self.hnsw is not None:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                # Write then rename so concurrent writers and loaders never see a partial file
+                tmp_path = f"{self.path}.hnsw.{os.getpid()}.{threading.get_ident()}.tmp"
+                self.hnsw.save_index(tmp_path)
+                os.replace(tmp_path, f"{self.path}.hnsw")
+
+    def load(self):
+        """Load the stored vectors; returns False when there are none.
+
+        The saved HNSW graph is loaded, or rebuilt, on the first search.
+        """
+        with self._lock:
+            self.hnsw = None
+        return bool(len(self.store))
+
+_job_index = None
+_job_index_lock = threading.Lock()
+
+def get_job_index():
+    """Process-wide job index, loaded from disk on first use"""
+    global _job_index
+    if _job_index is None:
+        with _job_index_lock:
+            if _job_index is None:
+                index = JobIndex()
+                index.load()
+                _job_index = index
+    return _job_index
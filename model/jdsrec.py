@@ -1,37 +1,16 @@
 import spacy
 from collections import defaultdict
-import pandas as pd
-from PyPDF2 import PdfReader
 import os
-import re
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
-
-
-nlp = spacy.load("en_core_web_lg")
-sentence_model = SentenceTransformer('paraphrase-MiniLM-L6-v2')
-
-DEGREE_PATTERN = re.compile(r"(Ph\.?D|Doctorate|Master'?s?|M\.?S|MBA|Bachelor'?s?|B\.?S|B\.?A|Associate'?s?)\s*(degree)?", re.IGNORECASE)
-
-def load_skill_dataset():
-        df = pd.read_csv('model/related_skills.csv')
-        all_skills = set()
-        for skills in df.values:
-            all_skills.update([skill.lower() for skill in skills if isinstance(skill, str)])
-        return all_skills
-   
-def read_pdf_resume(filename):
-    """Read and extract text from PDF resume"""
-    try:
-        resume_text = ""
-        reader = PdfReader(filename)
-        for page in reader.pages:
-            extracted_text = page.extract_text()
-            resume_text += extracted_text
-        return resume_text
-    except Exception as e:
-        print(f"Error reading PDF: {e}")
-        return ""
+import numpy as np
+from model.enrichment import job_title
+from model.index import get_job_index
+from model.metrics import timed
+from model.registry import get_nlp, SBERT_BATCH_SIZE, TOKENIZER_ONLY
+from model.resumes import get_resume_features, read_pdf_resume
+from model.scoring import (
+    sbert_similarities, score_jobs, stack_job_features, stream_job_features, top_indices
+)
+from model.skills import match_skills
 
 def read_job_desc(file_path):
     try:
@@ -42,11 +21,9 @@ def read_job_desc(file_path):
         print(f"Error reading file: {e}")
         return ""
 
-SKILL_DATABASE = load_skill_dataset()
-
 def extract_key_phrases(text):
     """Case-insensitive phrase extraction"""
-    doc = nlp(text.lower())
+    doc = get_nlp()(text.lower())
     
   
     phrases = defaultdict(set)
@@ -55,7 +32,7 @@ def extract_key_phrases(text):
         {"POS": "ADJ", "OP": "*"},
         {"POS": "VERB", "OP": "*"}
     ]
-    matcher = spacy.matcher.Matcher(nlp.vocab)
+    matcher = spacy.matcher.Matcher(get_nlp().vocab)
     matcher.add("KEY_PHRASES", [patterns])
     
     for match_id, start, end in matcher(doc):
@@ -65,7 +42,7 @@ def extract_key_phrases(text):
 
 def analyze_experience(text):
     """Case-insensitive experience analysis"""
-    doc = nlp(text.lower())
+    doc = get_nlp()(text.lower())
     
 
     experience = defaultdict(list)
@@ -96,30 +73,15 @@ def analyze_experience(text):
 
 def extract_skills(text):
     """Extract skills from text using the Kaggle dataset as reference"""
-    doc = nlp(text.lower())
-    found_skills = set()
-    
- 
-    for sent in doc.sents:
-       
-        for token in sent:
-            if token.text.lower() in SKILL_DATABASE:
-                found_skills.add(token.text.lower())
-            
-        # Check for multi-word skills
-        for i in range(len(sent)):
-            for j in range(i + 1, min(i + 4, len(sent) + 1)):  
-                phrase = ' '.join([token.text.lower() for token in sent[i:j]])
-                if phrase in SKILL_DATABASE:
-                    found_skills.add(phrase)
-    
-    return found_skills
+    # The compiled matcher finds multi-word skills itself, so only tokens are needed
+    doc = get_nlp(exclude=TOKENIZER_ONLY)(text)
+    return match_skills(doc)
 
 def enhanced_match_score(resume_text, job_desc_text):
     """Calculate match score using Kaggle dataset skills"""
 
-    resume_doc = nlp(resume_text.lower())
-    job_doc = nlp(job_desc_text.lower())
+    resume_doc = get_nlp()(resume_text.lower())
+    job_doc = get_nlp()(job_desc_text.lower())
 
     required_skills = extract_skills(job_desc_text)
     resume_skills = extract_skills(resume_text)
@@ -158,7 +120,7 @@ def enhanced_match_score(resume_text, job_desc_text):
 
 def extract_name_from_text(text):
     """Extract name from resume text using NER"""
-    doc = nlp(text)
+    doc = get_nlp()(text)
     
    
     first_section = doc[:1000]
@@ -203,121 +165,45 @@ def process_job_descs(resume_dir, job_desc_dir):
     results.sort(key=lambda x: x["composite_score"], reverse=True)
     return results
 
-class ResumeProcessor:
-    def __init__(self):
-        self.degree_scores = {
-            'phd': 1.0, 'doctorate': 1.0, 'master': 0.8, 'ms': 0.8,
-            'mba': 0.8, 'bachelor': 0.6, 'bs': 0.6, 'ba': 0.6, 'associate': 0.4
-        }
-
-    def extract_experience(self, text, is_job_description=False):
-        """Extract experience requirements from text"""
-        doc = nlp(text)
-        years = 0
-        
-        patterns = [
-            r"(\d+)\+? years? of experience",
-            r"minimum of (\d+) years",
-            r"at least (\d+) years"
-        ]
-        
-        if is_job_description:
-            for pattern in patterns:
-                match = re.search(pattern, text, re.IGNORECASE)
-                if match:
-                    years = max(years, int(match.group(1)))
-                    break
-        else:
-            for ent in doc.ents:
-                if ent.label_ == "DATE" and re.search(r'\d+', ent.text):
-                    years = max(years, int(re.search(r'\d+', ent.text).group()))
-        return {"years": years}
-
-    def extract_education(self, text):
-        """Extract education qualifications"""
-        doc = nlp(text)
-        matches = DEGREE_PATTERN.finditer(doc.text)
-        degrees = {match.group(1).lower() for match in matches}
-        score = max((self.degree_scores.get(deg, 0) for deg in degrees), default=0)
-        return {'score': score}
-
-    def extract_skills(self, text):
-        """Extract skills using predefined database"""
-        doc = nlp(text)
-        return {token.text.lower() for token in doc if token.text.lower() in SKILL_DATABASE}
+@timed("rank_jds")
+def rank_jds(resume_path, job_list, batch_size=SBERT_BATCH_SIZE, with_components=False, top_k=None, enrich=False,
+             resume_digest=None, resume=None):
+    """Rank job descriptions against a single resume
+
+    Jobs carrying "features" stored at posting time are scored without parsing their description.
+    with_components adds the individual score components to each result.
+    top_k returns only the best top_k jobs, selected without sorting the rest.
+    enrich adds each returned job's "title", its own or derived from the description once and cached.
+    resume_digest, when known, spares hashing the PDF; resume, features the caller already loaded, spares loading them.
+    """
+    if resume is None:
+        resume = get_resume_features(resume_path, resume_digest)
+    
+    if resume is None:
+        print("Error: Could not read resume")
+        return []
+    results = []
 
-def enhanced_sbert_matching(text1, text2):
-    """Calculate semantic similarity using SBERT"""
-    embeddings = sentence_model.encode([text1, text2])
-    return cosine_similarity([embeddings[0]], [embeddings[1]])[0][0]
+    # Jobs without stored features are encoded together in batched SBERT passes
+    missing = [job for job in job_list if not job.get("features")]
+    computed = stream_job_features((job['description'] for job in missing), batch_size)
+    computed = {job["id"]: features for job, features in zip(missing, computed)}
+    job_features = [job.get("features") or computed[job["id"]] for job in job_list]
 
-def calculate_preferred_score(resume_text, job_desc_text):
-    """Calculate preferred qualifications similarity using SpaCy"""
-    preferred_keywords = ["preferred qualifications", "nice to have", "desired skills"]
-    preferred_section = ""
-    
-    for line in job_desc_text.split('\n'):
-        if any(kw in line.lower() for kw in preferred_keywords):
-            preferred_section = line
-            break
-    
-    if preferred_section:
-        resume_doc = nlp(resume_text)
-        preferred_doc = nlp(preferred_section)
-        return resume_doc.similarity(preferred_doc)
-    return 0.5
+    # Jobs in the shared embedding store are compared against its mapped rows, the rest against their own embedding
+    similarities = get_job_index().store.similarities(resume["embedding"], [job["id"] for job in job_list])
+    unstored = np.flatnonzero(np.isnan(similarities))
+    if len(unstored):
+        similarities[unstored] = sbert_similarities(
+            resume["embedding"], [job_features[i]["embedding"] for i in unstored]
+        )
 
-def calculate_composite_score(resume_text, job_desc_text):
-    """Calculate final composite score"""
-    processor = ResumeProcessor()
-    
-    # Get job requirements
-    job_experience = processor.extract_experience(job_desc_text, is_job_description=True)
-    required_years = job_experience['years'] or 5
-    
-    # Calculate score components
-    sbert_similarity = enhanced_sbert_matching(resume_text, job_desc_text)
-    preferred_score = calculate_preferred_score(resume_text, job_desc_text)
-    
-    # Skill matching
-    resume_skills = processor.extract_skills(resume_text)
-    job_skills = processor.extract_skills(job_desc_text)
-    skill_match = len(resume_skills & job_skills) / max(len(job_skills), 1)
-    
-    # Experience and education
-    candidate_experience = processor.extract_experience(resume_text)
-    experience_score = min(candidate_experience['years'] / max(required_years, 1), 1.0)
-    education = processor.extract_education(resume_text)
-    
-    return (
-        0.2 * sbert_similarity +
-        0.40 * skill_match +
-        0.10 * experience_score +
-        0.10 * education['score'] +
-        0.2 * preferred_score +
-        0.1
-    )
+    # Every composite score in one pass of array operations
+    scores, components = score_jobs(resume, stack_job_features(job_features), similarities)
 
-def rank_jds(resume_path, job_list):
-    """Rank job descriptions against a single resume"""
-    resume_text = read_pdf_resume(resume_path)
-    
-    if not resume_text:
-        print("Error: Could not read resume")
-        return []
-    results = []
-    
     # for jd_file in os.listdir(jd_dir):
-    for job in job_list:
-        jd_text = job['description']
-            
-        # with open(os.path.join(jd_dir, jd_file), 'r', encoding='utf-8') as f:
-        #     jd_text = f.read()
-        
-        score = calculate_composite_score(resume_text, jd_text)
-        doc = nlp(jd_text)
-        job_title = next((ent.text for ent in doc.ents if ent.label_ == "JOB_TITLE"), "Unknown Position")
-        
+    for i in top_indices(scores, top_k):
+        job = job_list[i]
         # results.append({
         #     'job_title': job_title,
         #     'score': round(score, 2),
@@ -326,10 +212,12 @@ def rank_jds(resume_path, job_list):
 
         results.append({
             "id": job["id"],
-            "score": round(score, 2),
+            "score": round(float(scores[i]), 2),
+            **({"components": {name: float(values[i]) for name, values in components.items()}} if with_components else {}),
+            **({"title": job.get("title") or job_title(job.get("description") or "")} if enrich else {}),
         })
     
-    return sorted(results, key=lambda x: x['score'], reverse=True)
+    return results
 
 # if __name__ == "__main__":
 #     resume_path = "/Users/sainandhan/Desktop/Jobs/WisResume.pdf"
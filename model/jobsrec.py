@@ -1,176 +1,144 @@
-import spacy
-import re
-import pandas as pd
+import heapq
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import numpy as np
-from PyPDF2 import PdfReader
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
-
-nlp = spacy.load("en_core_web_lg")
-sentence_model = SentenceTransformer('paraphrase-MiniLM-L6-v2')
-
-DEGREE_PATTERN = re.compile(r"(Ph\.?D|Doctorate|Master'?s?|M\.?S|MBA|Bachelor'?s?|B\.?S|B\.?A|Associate'?s?)\s*(degree)?", re.IGNORECASE)
-
-
-def load_skill_database():
-    """Load skills from related_skills.csv"""
-    df = pd.read_csv('model/related_skills.csv')
-    return {skill.lower() for skills in df.values for skill in skills if isinstance(skill, str)}
-
-SKILL_DATABASE = load_skill_database()
-
-def read_pdf_resume(filename):
-    """Extract text from PDF resume"""
-    try:
-        resume_text = ""
-        reader = PdfReader(filename)
-        for page in reader.pages:
-            resume_text += page.extract_text() or ""
-        return resume_text.strip()
-    except Exception as e:
-        print(f"Error reading {filename}: {str(e)}")
-        return ""
-
-class ResumeProcessor:
-    def __init__(self):
-        self.degree_scores = {
-            'phd': 1.0, 'doctorate': 1.0, 'master': 0.8, 'ms': 0.8,
-            'mba': 0.8, 'bachelor': 0.6, 'bs': 0.6, 'ba': 0.6, 'associate': 0.4
-        }
-
-    def extract_experience(self, text, is_job_description=False):
-        """Extract experience requirements from text"""
-        doc = nlp(text)
-        years = 0
-        
-        
-        patterns = [
-            r"(\d+)\+? years? of experience",
-            r"minimum of (\d+) years",
-            r"at least (\d+) years"
-        ]
-        
-        if is_job_description:
-            for pattern in patterns:
-                match = re.search(pattern, text, re.IGNORECASE)
-                if match:
-                    years = max(years, int(match.group(1)))
-                    break
-        else:
-            # Extract candidate's experience from resume
-            for ent in doc.ents:
-                if ent.label_ == "DATE" and re.search(r'\d+', ent.text):
-                    years = max(years, int(re.search(r'\d+', ent.text).group()))
-        
-        return {"years": years}
-
-    def extract_education(self, text):
-        """Extract education qualifications"""
-        doc = nlp(text)
-        matches = DEGREE_PATTERN.finditer(doc.text)
-        degrees = {match.group(1).lower() for match in matches}
-        score = max((self.degree_scores.get(deg, 0) for deg in degrees), default=0)
-        return {'score': score}
-
-    def extract_skills(self, text):
-        """Extract skills using predefined database"""
-        doc = nlp(text)
-        return {token.text.lower() for token in doc if token.text.lower() in SKILL_DATABASE}
-
-def enhanced_sbert_matching(text1, text2):
-    """Calculate semantic similarity using SBERT"""
-    embeddings = sentence_model.encode([text1, text2])
-    return cosine_similarity([embeddings[0]], [embeddings[1]])[0][0]
-
-def calculate_preferred_score(resume_text, job_desc_text):
-    """Calculate preferred qualifications similarity using SpaCy"""
-    preferred_keywords = ["preferred qualifications", "nice to have", "desired skills"]
-    preferred_section = ""
-    
-    # Find preferred qualifications section
-    for line in job_desc_text.split('\n'):
-        if any(kw in line.lower() for kw in preferred_keywords):
-            preferred_section = line
-            break
-    
-    if preferred_section:
-        # Process texts with SpaCy
-        resume_doc = nlp(resume_text)
-        preferred_doc = nlp(preferred_section)
-        
-        # Calculate similarity
-        return resume_doc.similarity(preferred_doc)
-    
-    return 0.5  # Default score if no preferred section found
-
-def calculate_composite_score(resume_text, job_desc_text):
-    """Calculate final composite score"""
-    processor = ResumeProcessor()
-    
-    # Get job requirements
-    job_experience = processor.extract_experience(job_desc_text, is_job_description=True)
-    required_years = job_experience['years'] or 5  # Default to 5 years if not specified
-    
-    # Calculate score components
-    sbert_similarity = enhanced_sbert_matching(resume_text, job_desc_text)
-    preferred_score = calculate_preferred_score(resume_text, job_desc_text)
-    
-    # Skill matching
-    resume_skills = processor.extract_skills(resume_text)
-    job_skills = processor.extract_skills(job_desc_text)
-    skill_match = len(resume_skills & job_skills) / max(len(job_skills), 1)
-    
-    # Candidate experience
-    candidate_experience = processor.extract_experience(resume_text)
-    experience_score = min(candidate_experience['years'] / max(required_years, 1), 1.0)
-    
-    # Education
-    education = processor.extract_education(resume_text)
+from model.enrichment import candidate_name
+from model.metrics import timed
+from model.registry import get_nlp, get_sentence_model, NER_ONLY, SBERT_BATCH_SIZE
+from model.resumes import get_resume_features_batch, resume_store
+from model.scoring import (
+    JOB_EXCLUDE, combine_components, extract_job_features, parse_document, sbert_similarities, score_components
+)
+from model.skills import get_skill_matcher
+
+# Worker processes used by rank_candidates; 1 scores on the calling thread
+SCORING_WORKERS = int(os.environ.get("SCORING_WORKERS", "1"))
+# Applications per task sent to a worker, large enough to keep SBERT batches full
+SCORING_CHUNK_SIZE = int(os.environ.get("SCORING_CHUNK_SIZE", "64"))
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+def _init_scoring_worker():
+    """Load every model once per worker process, before it takes any task"""
+    import torch
+    # Workers already run in parallel, so keep each one single-threaded
+    torch.set_num_threads(1)
+    get_nlp(exclude=NER_ONLY)
+    get_sentence_model()
+    get_skill_matcher()
+
+def get_scoring_pool(workers):
+    """Process pool shared by parallel rank_candidates calls, rebuilt if the size changes"""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_scoring_worker,
+            )
+            _pool_workers = workers
+        return _pool
+
+def discard_scoring_pool(pool):
+    """Drop a broken pool so the next get_scoring_pool builds a fresh one"""
+    global _pool
+    with _pool_lock:
+        # Another caller may already have replaced it
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+def _best(results, top_k=None):
+    # A heap keeps only the top_k results instead of sorting all of them
+    if top_k is None:
+        return sorted(results, key=lambda x: x['score'], reverse=True)
+    return heapq.nlargest(top_k, results, key=lambda x: x['score'])
+
+def _rank_candidates_parallel(applicants, job, batch_size, with_components, workers, top_k=None, enrich=False):
+    chunk_size = min(SCORING_CHUNK_SIZE, -(-len(applicants) // workers))
+    # A worker that dies (e.g. OOM-killed) breaks its whole pool: retry once on a fresh one, then score here
+    for attempt in range(2):
+        pool = get_scoring_pool(workers)
+        try:
+            futures = [
+                pool.submit(
+                    rank_candidates, applicants[start:start + chunk_size], None, job, batch_size, with_components,
+                    1, top_k, enrich
+                )
+                for start in range(0, len(applicants), chunk_size)
+            ]
+            results = [result for future in futures for result in future.result()]
+            return _best(results, top_k)
+        except BrokenProcessPool as e:
+            print(f"Scoring pool broke on attempt {attempt + 1}: {str(e)}")
+            discard_scoring_pool(pool)
+    return rank_candidates(applicants, None, job, batch_size, with_components, 1, top_k, enrich)
+
+@timed("rank_candidates")
+def rank_candidates(resume_dir, job_desc_text, job_features=None, batch_size=SBERT_BATCH_SIZE, with_components=False,
+                    workers=SCORING_WORKERS, top_k=None, enrich=False):
+    """Process and rank candidates
+
+    Pass job_features stored at posting time to skip re-deriving them from job_desc_text.
+    with_components adds the individual score components to each result.
+    With workers > 1 applications are spread over a process pool; results are the same.
+    top_k returns only the best top_k candidates.
+    enrich adds each returned candidate's "name", parsed from the resume once and cached.
+    An applicant's "resume_digest", when known, spares hashing their PDF again.
+    """
+    results = []
+    job = job_features or extract_job_features(parse_document(job_desc_text, JOB_EXCLUDE))
+    if workers > 1 and len(resume_dir) > 1:
+        applicants = [{
+            "id": applicant["id"],
+            "resume_path": applicant["resume_path"],
+            "resume_digest": applicant.get("resume_digest"),
+        } for applicant in resume_dir]
+        return _rank_candidates_parallel(applicants, job, batch_size, with_components, workers, top_k, enrich)
 
-    return (
-        0.2 * sbert_similarity +
-        0.40 * skill_match +
-        0.10 * experience_score +
-        0.10 * education['score'] +
-        0.2 * preferred_score +
-        0.1
+    #for filename in os.listdir(resume_dir):
+    applicants = [applicant for applicant in resume_dir if applicant["resume_path"].endswith('.pdf')]
+    # Digests recorded at upload spare hashing every PDF; files are only read on a cache miss
+    resumes = get_resume_features_batch(
+        [applicant["resume_path"] for applicant in applicants], batch_size,
+        [applicant.get("resume_digest") for applicant in applicants]
     )
+    scored = [(applicant, resume) for applicant, resume in zip(applicants, resumes) if resume is not None]
 
-def rank_candidates(resume_dir, job_desc_text):
-    """Process and rank candidates"""
-    results = []
-    
-    #for filename in os.listdir(resume_dir):
-    for applicant in resume_dir:
-        filename = applicant["resume_path"]
+    # One matrix-vector product over the shared embedding store instead of an SBERT call per resume
+    similarities = resume_store.embeddings.similarities(job["embedding"], [resume["digest"] for _, resume in scored])
+    unstored = np.flatnonzero(np.isnan(similarities))
+    if len(unstored):
+        similarities[unstored] = sbert_similarities(job["embedding"], [scored[i][1]["embedding"] for i in unstored])
 
-        if not filename.endswith('.pdf'):
-            continue
-            
+    for (applicant, resume), similarity in zip(scored, similarities):
         try:
-            resume_text = read_pdf_resume(filename) #os.path.join(resume_dir, filename)
-            if not resume_text:
-                continue
-                
-            score = calculate_composite_score(resume_text, job_desc_text)
-            doc = nlp(resume_text)
-            #name = next((ent.text for ent in doc.ents if ent.label_ == "PERSON"), "Unknown")
-            
-            # results.append({
-            #     'name': name,
-            #     'score': round(score, 2),
-            #     'file': filename
-            # })
+            components = score_components(resume, job, similarity)
 
             results.append({
                 "id": applicant["id"],
-                "score": round(score, 2),
+                "score": round(combine_components(components), 2),
+                **({"components": components} if with_components else {}),
             })
             
         except Exception as e:
-            print(f"Error processing {filename}: {str(e)}")
-    
-    return sorted(results, key=lambda x: x['score'], reverse=True)
+            print(f"Error processing {applicant['resume_path']}: {str(e)}")
+
+    results = _best(results, top_k)
+    if enrich:
+        # Only the candidates actually returned are enriched
+        texts = {applicant["id"]: resume["text"] for applicant, resume in scored}
+        for result in results:
+            result["name"] = candidate_name(texts[result["id"]])
+    return results
 
 # if __name__ == "__main__":
 #     job_desc = """We are seeking a Data Scientist with experience in Python, SQL, Machine Learning, and Data Visualization."""
@@ -0,0 +1,164 @@
+import functools
+import json
+import math
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Stage timings are only collected when enabled; disabled, timed() returns functions unchanged
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "0") == "1"
+# Serve /metrics (Prometheus text) and /metrics.json on this address when METRICS_PORT is set
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+# Upper bounds in seconds, Prometheus style
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, math.inf)
+
+_lock = threading.Lock()
+_histograms = {}
+
+
+class Histogram:
+    """Cumulative count, sum and bucket counts of one stage's durations"""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += seconds
+
+def observe(stage, seconds):
+    """Record one duration of a stage"""
+    with _lock:
+        histogram = _histograms.get(stage)
+        if histogram is None:
+            histogram = _histograms[stage] = Histogram()
+        histogram.observe(seconds)
+
+class _Timer:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.stage, time.perf_counter() - self.start)
+        return False
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+def timer(stage):
+    """Context manager timing a block as one observation of stage"""
+    return _Timer(stage) if METRICS_ENABLED else _NULL_TIMER
+
+def timed(stage):
+    """Decorator timing every call of a function as stage; a no-op when metrics are disabled"""
+    def decorator(func):
+        if not METRICS_ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _Timer(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def snapshot():
+    """Every stage's histogram as plain dicts, ready for JSON"""
+    with _lock:
+        return {
+            stage: {
+                "count": histogram.count,
+                "sum": histogram.sum,
+                "buckets": {
+                    ("+Inf" if math.isinf(bound) else str(bound)): count
+                    for bound, count in zip(histogram.buckets, histogram.counts)
+                },
+            }
+            for stage, histogram in sorted(_histograms.items())
+        }
+
+def dump_json(path):
+    """Write snapshot() to a file"""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(snapshot(), f, indent=2)
+
+def render_prometheus():
+    """Every stage's histogram in the Prometheus text exposition format"""
+    lines = [
+        "# HELP jobswipe_stage_seconds Time spent in each recommender stage and MongoDB call",
+        "# TYPE jobswipe_stage_seconds histogram",
+    ]
+    for stage, histogram in snapshot().items():
+        cumulative = 0
+        for bound, count in histogram["buckets"].items():
+            cumulative += count
+            lines.append(f'jobswipe_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+        lines.append(f'jobswipe_stage_seconds_sum{{stage="{stage}"}} {histogram["sum"]}')
+        lines.append(f'jobswipe_stage_seconds_count{{stage="{stage}"}} {histogram["count"]}')
+    return "\n".join(lines) + "\n"
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/metrics":
+            body, content_type = render_prometheus(), "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            body, content_type = json.dumps(snapshot()), "application/json"
+        else:
+            self.send_error(404)
+            return
+        body = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+_server = None
+_server_failed = False
+
+def start_metrics_server(host=METRICS_HOST, port=METRICS_PORT):
+    """Serve the metrics from a daemon thread, once per process; does nothing without a port.
+
+    Processes sharing a host need their own METRICS_PORT; one whose port is
+    taken logs it and runs without the endpoint rather than failing to start.
+    """
+    global _server, _server_failed
+    if not port or not METRICS_ENABLED:
+        return None
+    with _lock:
+        # Streamlit reruns call this on every page load; a failed bind is not retried
+        if _server is None and not _server_failed:
+            try:
+                _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            except OSError as e:
+                _server_failed = True
+                print(f"Error starting metrics server on {host}:{port}: {e}")
+                return None
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+    return _server
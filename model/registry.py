@@ -0,0 +1,98 @@
+import os
+import threading
+
+import spacy
+from sentence_transformers import SentenceTransformer
+
+SPACY_MODEL = "en_core_web_lg"
+SBERT_MODEL = "paraphrase-MiniLM-L6-v2"
+EMBEDDING_DIM = 384
+SBERT_BATCH_SIZE = int(os.environ.get("SBERT_BATCH_SIZE", "32"))
+# nlp.pipe settings for bulk parsing; n_process > 1 forks workers that each load the model
+SPACY_BATCH_SIZE = int(os.environ.get("SPACY_BATCH_SIZE", "64"))
+SPACY_N_PROCESS = int(os.environ.get("SPACY_N_PROCESS", "1"))
+
+# Components to exclude for trimmed pipelines, named after what is left running.
+# en_core_web_lg's ner embeds tokens itself; the shared tok2vec only feeds tagger and parser,
+# and get_nlp keeps it anyway for a model whose remaining components listen to it
+TOKENIZER_ONLY = ("tok2vec", "tagger", "parser", "attribute_ruler", "lemmatizer", "ner")
+NER_ONLY = ("tok2vec", "tagger", "parser", "attribute_ruler", "lemmatizer")
+
+_lock = threading.Lock()
+# Loaded pipelines by the components excluded at load time, and the trimmed views over them
+_pipelines = {}
+_views = {}
+_sentence_model = None
+
+
+class _TrimmedPipeline:
+    """A loaded pipeline run with some of its components disabled; shares the pipeline's memory"""
+
+    def __init__(self, nlp, disable):
+        self.nlp = nlp
+        self.disable = list(disable)
+        self.vocab = nlp.vocab
+        self.pipe_names = [name for name in nlp.pipe_names if name not in self.disable]
+
+    def __call__(self, text):
+        return self.nlp(text, disable=self.disable)
+
+    def pipe(self, texts, **kwargs):
+        return self.nlp.pipe(texts, disable=self.disable, **kwargs)
+
+def _listened(nlp, running):
+    # Whether any of the running components reads the shared tok2vec's output
+    if "tok2vec" not in nlp.pipe_names:
+        return False
+    return any(name in running for name in nlp.get_pipe("tok2vec").listening_components)
+
+def _load_pipeline(wanted):
+    # A loaded pipeline that has every wanted component, or else a new one. The ranking
+    # paths only need what NER_ONLY keeps, so they load that directly rather than the full model
+    for excluded, nlp in _pipelines.items():
+        if set(excluded) <= wanted:
+            return excluded, nlp
+    excluded = NER_ONLY if wanted >= set(NER_ONLY) else ()
+    base = next(iter(_pipelines.values()), None)
+    # tok2vec is loaded and then dropped, so its listeners can be checked first
+    load_exclude = [name for name in excluded if name != "tok2vec"]
+    if base is None:
+        nlp = spacy.load(SPACY_MODEL, exclude=load_exclude)
+    else:
+        # Only the legacy helpers ask for the full model once a trimmed one is loaded
+        nlp = spacy.load(SPACY_MODEL, vocab=base.vocab, exclude=load_exclude)
+    if "tok2vec" in excluded:
+        if _listened(nlp, nlp.pipe_names):
+            excluded = tuple(name for name in excluded if name != "tok2vec")
+        else:
+            nlp.remove_pipe("tok2vec")
+    _pipelines[excluded] = nlp
+    return excluded, nlp
+
+def get_nlp(exclude=()):
+    """Return the shared spaCy pipeline, loaded once per process on first use.
+
+    Trimmed pipelines (``exclude`` is a list of component names) run a loaded
+    pipeline with those components disabled instead of loading another copy.
+    """
+    key = tuple(sorted(exclude))
+    if key in _views:
+        return _views[key]
+    with _lock:
+        if key not in _views:
+            excluded, nlp = _load_pipeline(set(key))
+            disable = [name for name in nlp.pipe_names if name in set(key) - set(excluded)]
+            if "tok2vec" in disable and _listened(nlp, set(nlp.pipe_names) - set(disable)):
+                disable.remove("tok2vec")
+            _views[key] = _TrimmedPipeline(nlp, disable) if disable else nlp
+    return _views[key]
+
+
+def get_sentence_model():
+    """Return the shared SentenceTransformer, loaded once per process on first use"""
+    global _sentence_model
+    if _sentence_model is None:
+        with _lock:
+            if _sentence_model is None:
+                _sentence_model = SentenceTransformer(SBERT_MODEL)
+    return _sentence_model
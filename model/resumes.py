@@ -0,0 +1,195 @@
+import hashlib
+import os
+import pickle
+import re
+from itertools import islice
+from PyPDF2 import PdfReader
+from model.embeddings import EmbeddingStore
+from model.metrics import timed
+from model.registry import SBERT_BATCH_SIZE
+from model.scoring import extract_resume_features, features_current, parse_document, stream_resume_features
+
+FEATURE_CACHE_DIR = os.environ.get("FEATURE_CACHE_DIR", "cache")
+# Extraction limits; text past them adds latency without changing the ranking much
+RESUME_MAX_PAGES = int(os.environ.get("RESUME_MAX_PAGES", "10"))
+RESUME_MAX_CHARS = int(os.environ.get("RESUME_MAX_CHARS", "20000"))
+
+_SPACES = re.compile(r"[ \t\r\f\v]+")
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+
+def normalize_text(text):
+    """Collapse runs of spaces and blank lines left behind by PDF extraction"""
+    lines = (_SPACES.sub(" ", line).strip() for line in text.split("\n"))
+    return _BLANK_LINES.sub("\n\n", "\n".join(lines)).strip()
+
+@timed("pdf_extraction")
+def read_pdf_resume(filename, max_pages=RESUME_MAX_PAGES, max_chars=RESUME_MAX_CHARS):
+    """Extract text from PDF resume, stopping after max_pages pages or max_chars characters"""
+    try:
+        pages = []
+        length = 0
+        reader = PdfReader(filename)
+        for page in islice(reader.pages, max_pages):
+            page_text = page.extract_text() or ""
+            pages.append(page_text)
+            length += len(page_text)
+            if length >= max_chars:
+                break
+        return normalize_text("\n".join(pages))[:max_chars]
+    except Exception as e:
+        print(f"Error reading {filename}: {str(e)}")
+        return ""
+
+def file_digest(filename):
+    """SHA-256 of a file's content, read in chunks"""
+    digest = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ResumeTextStore:
+    """Normalized resume text persisted on disk, keyed by the hash of the PDF content"""
+
+    def __init__(self, directory=None):
+        self.directory = os.path.join(directory or FEATURE_CACHE_DIR, "texts")
+
+    def _path(self, digest):
+        return os.path.join(self.directory, f"{digest}.txt")
+
+    def get(self, digest):
+        try:
+            with open(self._path(digest), encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, digest, text):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{self._path(digest)}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, self._path(digest))
+
+    def load(self, filename, digest=None):
+        """Return the cached text of a resume, extracting it from the PDF on a miss"""
+        digest = digest or file_digest(filename)
+        text = self.get(digest)
+        if text is None:
+            text = read_pdf_resume(filename)
+            # An empty result may be a transient read error, so it is not cached
+            if text:
+                self.put(digest, text)
+        return text
+
+resume_text_store = ResumeTextStore()
+
+def extract_resume_text(filename):
+    """Extract and cache the text of an uploaded resume; returns its content digest"""
+    digest = file_digest(filename)
+    resume_text_store.load(filename, digest)
+    return digest
+
+def _extract_features(texts, batch_size):
+    # Streams through the batched extractor; a batch that fails is retried one resume at a
+    # time, so a resume that breaks spaCy or SBERT only loses its own features (None)
+    start = 0
+    while start < len(texts):
+        try:
+            for features in stream_resume_features(texts[start:], batch_size):
+                yield features
+                start += 1
+        except Exception as e:
+            print(f"Error extracting resume features, retrying one at a time: {str(e)}")
+            for text in texts[start:start + batch_size]:
+                try:
+                    yield extract_resume_features(parse_document(text))
+                except Exception as e:
+                    print(f"Error extracting resume features: {str(e)}")
+                    yield None
+            start += batch_size
+
+class ResumeFeatureStore:
+    """Resume features persisted on disk, keyed by the hash of the PDF content.
+
+    SBERT embeddings are also appended to a shared memory-mapped store so
+    rankers can compare many resumes without unpickling their vectors.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = os.path.join(directory or FEATURE_CACHE_DIR, "resumes")
+        self.embeddings = EmbeddingStore(os.path.join(directory or FEATURE_CACHE_DIR, "embeddings", "resumes"))
+
+    def _path(self, digest):
+        return os.path.join(self.directory, f"{digest}.pkl")
+
+    def get(self, digest):
+        try:
+            with open(self._path(digest), "rb") as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+
+    def put(self, digest, features):
+        os.makedirs(self.directory, exist_ok=True)
+        # Write then rename so concurrent readers never see a partial file
+        tmp_path = f"{self._path(digest)}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(features, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self._path(digest))
+
+    def load(self, filename, digest=None):
+        """Return cached features for a resume, extracting and storing them on a miss"""
+        return self.load_many([filename], digests=[digest])[0]
+
+    @timed("resume_features")
+    def load_many(self, filenames, batch_size=SBERT_BATCH_SIZE, digests=None):
+        """Features for many resumes (None for unreadable ones), misses encoded in one batch.
+
+        digests, when given, are the known content digests of the files (None
+        where unknown); those files are only read on a cache miss.
+        """
+        features = {}
+        misses = []
+        unstored = {}
+        for filename, digest in zip(filenames, digests or [None] * len(filenames)):
+            try:
+                digest = digest or file_digest(filename)
+            except OSError as e:
+                print(f"Error reading {filename}: {str(e)}")
+                continue
+            cached = self.get(digest)
+            if cached is None or not features_current(cached):
+                misses.append((filename, digest))
+            else:
+                features[filename] = cached
+                if digest not in self.embeddings:
+                    unstored[digest] = cached["embedding"]
+
+        readable = []
+        for filename, digest in misses:
+            resume_text = resume_text_store.load(filename, digest)
+            if resume_text:
+                readable.append((filename, digest, resume_text))
+        extracted = _extract_features([text for _, _, text in readable], batch_size)
+        for (filename, digest, _), resume in zip(readable, extracted):
+            if resume is None:
+                continue
+            resume["digest"] = digest
+            self.put(digest, resume)
+            features[filename] = resume
+            unstored[digest] = resume["embedding"]
+        self.embeddings.add(unstored.keys(), list(unstored.values()))
+
+        return [features.get(filename) for filename in filenames]
+
+resume_store = ResumeFeatureStore()
+
+def get_resume_features(filename, digest=None):
+    """Resume features for a PDF on disk, served from the feature store when unchanged"""
+    return resume_store.load(filename, digest)
+
+def get_resume_features_batch(filenames, batch_size=SBERT_BATCH_SIZE, digests=None):
+    """Resume features for many PDFs, in input order, None where a resume cannot be read"""
+    return resume_store.load_many(filenames, batch_size, digests)
@@ -0,0 +1,303 @@
+import re
+from itertools import islice
+import numpy as np
+from model.embeddings import normalize_rows
+from model.metrics import timed, timer
+from model.registry import (
+    get_nlp, get_sentence_model, NER_ONLY, TOKENIZER_ONLY, SBERT_BATCH_SIZE, SPACY_BATCH_SIZE, SPACY_N_PROCESS
+)
+from model.skills import (
+    SKILL_VOCAB_DIGEST, match_skills, popcount, skill_bit_matrix, skill_bits, skill_match_scores
+)
+
+DEGREE_PATTERN = re.compile(r"(Ph\.?D|Doctorate|Master'?s?|M\.?S|MBA|Bachelor'?s?|B\.?S|B\.?A|Associate'?s?)\s*(degree)?", re.IGNORECASE)
+PREFERRED_KEYWORDS = ["preferred qualifications", "nice to have", "desired skills"]
+# Bump whenever extraction changes so cached resume and job features are recomputed
+FEATURES_VERSION = 5
+# Preferred score when a job description has no preferred qualifications line
+DEFAULT_PREFERRED_SCORE = 0.5
+# Resume experience is read from DATE entities; job features only need tokens and word vectors
+RESUME_EXCLUDE = NER_ONLY
+JOB_EXCLUDE = TOKENIZER_ONLY
+
+
+def features_current(features):
+    """Whether cached features were extracted by this version against this skill vocabulary"""
+    return features.get("version") == FEATURES_VERSION and features.get("skill_vocab") == SKILL_VOCAB_DIGEST
+
+def parse_document(text, exclude=RESUME_EXCLUDE):
+    """Parse text once; the resulting Doc is shared by every feature extractor"""
+    return get_nlp(exclude=exclude)(text)
+
+def parse_documents(texts, exclude=RESUME_EXCLUDE, batch_size=SPACY_BATCH_SIZE, n_process=SPACY_N_PROCESS):
+    """Lazily parse many texts through nlp.pipe, yielding Docs in input order"""
+    return get_nlp(exclude=exclude).pipe(texts, batch_size=batch_size, n_process=n_process)
+
+def _batches(items, size, stage):
+    # Items may be produced lazily (nlp.pipe), so drawing each batch is what gets timed
+    items = iter(items)
+    while True:
+        with timer(stage):
+            batch = list(islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+class ResumeProcessor:
+    def __init__(self):
+        self.degree_scores = {
+            'phd': 1.0, 'doctorate': 1.0, 'master': 0.8, 'ms': 0.8,
+            'mba': 0.8, 'bachelor': 0.6, 'bs': 0.6, 'ba': 0.6, 'associate': 0.4
+        }
+
+    def extract_experience(self, doc, is_job_description=False):
+        """Extract experience requirements from a parsed document"""
+        years = 0
+
+        patterns = [
+            r"(\d+)\+? years? of experience",
+            r"minimum of (\d+) years",
+            r"at least (\d+) years"
+        ]
+
+        if is_job_description:
+            for pattern in patterns:
+                match = re.search(pattern, doc.text, re.IGNORECASE)
+                if match:
+                    years = max(years, int(match.group(1)))
+                    break
+        else:
+            # Extract candidate's experience from resume
+            for ent in doc.ents:
+                if ent.label_ == "DATE" and re.search(r'\d+', ent.text):
+                    years = max(years, int(re.search(r'\d+', ent.text).group()))
+
+        return {"years": years}
+
+    def extract_education(self, doc):
+        """Extract education qualifications from a parsed document"""
+        matches = DEGREE_PATTERN.finditer(doc.text)
+        degrees = {match.group(1).lower() for match in matches}
+        score = max((self.degree_scores.get(deg, 0) for deg in degrees), default=0)
+        return {'score': score}
+
+    def extract_skills(self, doc):
+        """Extract single- and multi-word skills from a parsed document using predefined database"""
+        return match_skills(doc)
+
+# Holds no per-document state, so every extraction shares one
+default_processor = ResumeProcessor()
+
+def find_preferred_section(job_doc):
+    """Return the preferred qualifications line of a parsed job description as a Span"""
+    start = 0
+    for line in job_doc.text.split('\n'):
+        if any(kw in line.lower() for kw in PREFERRED_KEYWORDS):
+            return job_doc.char_span(start, start + len(line), alignment_mode="expand")
+        start += len(line) + 1
+    return None
+
+def cosine(a, b):
+    """Cosine similarity of two vectors, 0 when either is all zeros"""
+    norm = np.linalg.norm(a) * np.linalg.norm(b)
+    return float(np.dot(a, b) / norm) if norm else 0.0
+
+@timed("sbert_encode")
+def encode_texts(texts, batch_size=SBERT_BATCH_SIZE):
+    """Encode many texts with SBERT in batched forward passes"""
+    texts = list(texts)
+    if not texts:
+        return []
+    return get_sentence_model().encode(texts, batch_size=batch_size)
+
+def sbert_similarities(embedding, embeddings):
+    """Cosine similarity of one embedding against every row of a matrix"""
+    if len(embeddings) == 0:
+        return np.zeros(0, dtype=np.float32)
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    vector = np.asarray(embedding, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(vector)
+    return np.divide(matrix @ vector, norms, out=np.zeros(len(matrix), dtype=np.float32), where=norms > 0)
+
+def preferred_scores(resume_vector, preferred_vectors):
+    """Preferred scores of one resume against many jobs' preferred_vector features (None where a job has none)"""
+    scores = np.full(len(preferred_vectors), DEFAULT_PREFERRED_SCORE, dtype=np.float32)
+    present = [i for i, vector in enumerate(preferred_vectors) if vector is not None]
+    if present:
+        # Both sides are stored at unit length, so the cosine is a plain dot product
+        matrix = np.asarray([preferred_vectors[i] for i in present], dtype=np.float32)
+        scores[present] = matrix @ np.asarray(resume_vector, dtype=np.float32)
+    return scores
+
+def extract_resume_features(resume_doc, processor=None, embedding=None):
+    """Derive every resume-side input of the composite score from a parsed resume"""
+    processor = processor or default_processor
+    if embedding is None:
+        embedding = get_sentence_model().encode(resume_doc.text)
+    return {
+        "version": FEATURES_VERSION,
+        "skill_vocab": SKILL_VOCAB_DIGEST,
+        "text": resume_doc.text,
+        "skills": skill_bits(processor.extract_skills(resume_doc)),
+        "years": processor.extract_experience(resume_doc)["years"],
+        "education": processor.extract_education(resume_doc)["score"],
+        "embedding": embedding,
+        # Averaged word vector, what Doc.similarity compares against, scaled to unit length
+        "vector": normalize_rows(resume_doc.vector),
+    }
+
+def extract_resume_features_batch(resume_docs, batch_size=SBERT_BATCH_SIZE):
+    """Resume features for many parsed resumes, encoded with one batched SBERT call"""
+    processor = default_processor
+    embeddings = encode_texts((doc.text for doc in resume_docs), batch_size)
+    return [extract_resume_features(doc, processor, embedding) for doc, embedding in zip(resume_docs, embeddings)]
+
+def extract_job_features(job_doc, processor=None, embedding=None):
+    """Derive every job-side input of the composite score from a parsed job description.
+
+    Values are plain lists and numbers so the result can be stored in MongoDB as is.
+    """
+    processor = processor or default_processor
+    if embedding is None:
+        embedding = get_sentence_model().encode(job_doc.text)
+    job_experience = processor.extract_experience(job_doc, is_job_description=True)
+    preferred_section = find_preferred_section(job_doc)
+    return {
+        "version": FEATURES_VERSION,
+        "skill_vocab": SKILL_VOCAB_DIGEST,
+        "required_years": job_experience['years'] or 5,  # Default to 5 years if not specified
+        "skills": skill_bits(processor.extract_skills(job_doc)),
+        "embedding": np.asarray(embedding).tolist(),
+        # Unit-length averaged word vector of the preferred qualifications line
+        "preferred_vector": normalize_rows(preferred_section.vector).tolist() if preferred_section else None,
+    }
+
+def extract_job_features_batch(job_docs, batch_size=SBERT_BATCH_SIZE):
+    """Job features for many parsed job descriptions, encoded with one batched SBERT call"""
+    processor = default_processor
+    embeddings = encode_texts((doc.text for doc in job_docs), batch_size)
+    return [extract_job_features(doc, processor, embedding) for doc, embedding in zip(job_docs, embeddings)]
+
+def stream_resume_features(texts, batch_size=SBERT_BATCH_SIZE, spacy_batch_size=SPACY_BATCH_SIZE,
+                           n_process=SPACY_N_PROCESS):
+    """Yield resume features for an iterable of resume texts, in input order.
+
+    Texts are parsed with nlp.pipe and encoded with SBERT one batch at a time,
+    so memory stays flat however many resumes are streamed through.
+    """
+    docs = parse_documents(texts, RESUME_EXCLUDE, spacy_batch_size, n_process)
+    for batch in _batches(docs, batch_size, "spacy_parse"):
+        yield from extract_resume_features_batch(batch, batch_size)
+
+def stream_job_features(texts, batch_size=SBERT_BATCH_SIZE, spacy_batch_size=SPACY_BATCH_SIZE,
+                        n_process=SPACY_N_PROCESS):
+    """Yield job features for an iterable of job description texts, in input order"""
+    docs = parse_documents(texts, JOB_EXCLUDE, spacy_batch_size, n_process)
+    for batch in _batches(docs, batch_size, "spacy_parse"):
+        yield from extract_job_features_batch(batch, batch_size)
+
+def score_components(resume, job, sbert_similarity=None, preferred_score=None):
+    """Individual composite score components for precomputed resume and job features
+
+    Rankers pass sbert_similarity and preferred_score when they have computed them for a whole batch at once.
+    """
+    if sbert_similarity is None:
+        sbert_similarity = cosine(resume["embedding"], job["embedding"])
+    if preferred_score is None:
+        preferred_score = preferred_scores(resume["vector"], [job["preferred_vector"]])[0]
+
+    # Skill matching over packed skill bitsets
+    skill_match = float(skill_match_scores(resume["skills"], skill_bit_matrix([job["skills"]]))[0])
+
+    # Candidate experience
+    experience_score = min(resume["years"] / max(job["required_years"], 1), 1.0)
+
+    return {
+        "sbert": float(sbert_similarity),
+        "skills": skill_match,
+        "experience": experience_score,
+        "education": resume["education"],
+        "preferred": float(preferred_score),
+    }
+
+def combine_components(components):
+    """Weighted composite score from score_components output"""
+    return (
+        0.2 * components["sbert"] +
+        0.40 * components["skills"] +
+        0.10 * components["experience"] +
+        0.10 * components["education"] +
+        0.2 * components["preferred"] +
+        0.1
+    )
+
+def stack_job_features(job_features):
+    """Column arrays over many jobs' features, the input of score_jobs.
+
+    Skills become a matrix of packed bitsets; preferred vectors are zero
+    rows where a job has none.
+    """
+    skills = skill_bit_matrix([features["skills"] for features in job_features])
+    preferred = [features["preferred_vector"] for features in job_features]
+    width = next((len(vector) for vector in preferred if vector is not None), 0)
+    return {
+        "count": len(job_features),
+        "embeddings": (
+            np.asarray([features["embedding"] for features in job_features], dtype=np.float32)
+            if all("embedding" in features for features in job_features) else None
+        ),
+        "skills": skills,
+        "skill_counts": popcount(skills),
+        "required_years": np.asarray([features["required_years"] for features in job_features], dtype=np.float32),
+        "preferred_vectors": np.asarray(
+            [np.zeros(width) if vector is None else vector for vector in preferred], dtype=np.float32
+        ).reshape(len(preferred), width),
+        "has_preferred": np.asarray([vector is not None for vector in preferred], dtype=bool),
+    }
+
+@timed("score_jobs")
+def score_jobs(resume, jobs, sbert=None):
+    """Composite scores of one resume against every job of stack_job_features output.
+
+    Same components and weights as score_components and combine_components,
+    computed with array operations. Pass sbert when the similarities come
+    from somewhere else (the embedding store). Returns the scores and a
+    dict of component arrays.
+    """
+    if sbert is None:
+        sbert = sbert_similarities(resume["embedding"], jobs["embeddings"])
+
+    preferred = np.full(jobs["count"], DEFAULT_PREFERRED_SCORE, dtype=np.float32)
+    if jobs["has_preferred"].any():
+        preferred[jobs["has_preferred"]] = jobs["preferred_vectors"][jobs["has_preferred"]] @ resume["vector"]
+
+    components = {
+        "sbert": np.asarray(sbert, dtype=np.float32),
+        "skills": skill_match_scores(resume["skills"], jobs["skills"], jobs["skill_counts"]),
+        "experience": np.minimum(resume["years"] / np.maximum(jobs["required_years"], 1), 1.0),
+        "education": np.full(jobs["count"], resume["education"], dtype=np.float32),
+        "preferred": preferred,
+    }
+    return combine_components(components), components
+
+def top_indices(scores, k=None):
+    """Positions of the k highest scores, best first; every position when k is None.
+
+    argpartition selects the top k in linear time, so only those k are sorted.
+    """
+    scores = np.asarray(scores)
+    if k is None or k >= len(scores):
+        return np.argsort(-scores, kind="stable")
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+def score_features(resume, job, sbert_similarity=None):
+    """Calculate final composite score from precomputed resume and job features"""
+    return combine_components(score_components(resume, job, sbert_similarity))
+
+def calculate_composite_score(resume_text, job_desc_text):
+    """Calculate final composite score"""
+    resume = extract_resume_features(parse_document(resume_text))
+    return score_features(resume, extract_job_features(parse_document(job_desc_text, JOB_EXCLUDE)))
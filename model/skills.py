@@ -0,0 +1,138 @@
+import csv
+import hashlib
+import os
+import pickle
+import sys
+import threading
+from pathlib import Path
+import numpy as np
+import spacy
+from spacy.matcher import PhraseMatcher
+from spacy.tokens import Doc
+from model.metrics import timed
+from model.registry import get_nlp, TOKENIZER_ONLY
+
+SKILLS_CSV = Path(__file__).with_name("related_skills.csv")
+SKILLS_ARTIFACT = Path(os.environ.get("SKILLS_ARTIFACT", Path(__file__).with_name("related_skills.pkl")))
+# Bump when the artifact layout changes so stale artifacts are rebuilt
+ARTIFACT_VERSION = 1
+
+
+def read_skills_csv(path=SKILLS_CSV):
+    """Every skill in related_skills.csv, lowercased"""
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = csv.reader(f)
+        next(rows, None)  # header
+        return {cell.strip().lower() for row in rows for cell in row if cell.strip()}
+
+def _digest(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def build_skill_artifact(csv_path=SKILLS_CSV):
+    """Compile the skill list and its tokenized match patterns.
+
+    The PhraseMatcher itself is not stored: pickling it pickles its vocab,
+    word vectors included, and it has to share the loaded pipeline's vocab.
+    """
+    skills = tuple(sys.intern(skill) for skill in sorted(read_skills_csv(csv_path)))
+    # Same tokenizer rules as en_core_web_lg, without loading the model
+    tokenizer = spacy.blank("en").tokenizer
+    return {
+        "version": ARTIFACT_VERSION,
+        "source_digest": _digest(csv_path),
+        "skills": skills,
+        "patterns": tuple(tuple(token.text for token in doc) for doc in tokenizer.pipe(skills)),
+    }
+
+def write_skill_artifact(artifact, artifact_path=SKILLS_ARTIFACT):
+    """Pickle a compiled artifact, replacing the old one atomically"""
+    tmp_path = f"{artifact_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(artifact, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, artifact_path)
+
+def load_skill_artifact(csv_path=SKILLS_CSV, artifact_path=SKILLS_ARTIFACT):
+    """Load the compiled skill artifact, rebuilding it when related_skills.csv changed"""
+    try:
+        with open(artifact_path, "rb") as f:
+            artifact = pickle.load(f)
+    except (FileNotFoundError, pickle.UnpicklingError, EOFError):
+        artifact = None
+    # A deployment may ship the artifact without the CSV; trust it then
+    if os.path.exists(csv_path) and (
+        artifact is None
+        or artifact.get("version") != ARTIFACT_VERSION
+        or artifact.get("source_digest") != _digest(csv_path)
+    ):
+        artifact = build_skill_artifact(csv_path)
+        try:
+            write_skill_artifact(artifact, artifact_path)
+        except OSError as e:
+            # Read-only installs use the artifact built in memory
+            print(f"Error writing skill artifact {artifact_path}: {e}")
+    if artifact is None:
+        raise FileNotFoundError(f"Neither {csv_path} nor {artifact_path} exists")
+    return artifact
+
+_artifact = load_skill_artifact()
+SKILL_DATABASE = frozenset(_artifact["skills"])
+# Position of each skill in the compiled vocabulary, its bit in a skill bitset
+SKILL_IDS = {skill: skill_id for skill_id, skill in enumerate(_artifact["skills"])}
+# Bitsets are only comparable when packed against the same vocabulary
+SKILL_VOCAB_DIGEST = _artifact["source_digest"]
+SKILL_BITSET_BYTES = (len(SKILL_IDS) + 7) // 8
+_POPCOUNT = np.array([bin(byte).count("1") for byte in range(256)], dtype=np.uint8)
+
+def skill_bits(skills):
+    """Pack skills from SKILL_DATABASE into a bitset over the compiled vocabulary"""
+    mask = np.zeros(len(SKILL_IDS), dtype=bool)
+    mask[[SKILL_IDS[skill] for skill in skills if skill in SKILL_IDS]] = True
+    return np.packbits(mask).tobytes()
+
+def skill_bit_matrix(bitsets):
+    """Stack skill_bits bitsets into an (N, SKILL_BITSET_BYTES) uint8 matrix"""
+    return np.frombuffer(b"".join(bitsets), dtype=np.uint8).reshape(-1, SKILL_BITSET_BYTES)
+
+def popcount(bits):
+    """Number of set bits in each row of a uint8 matrix, through a byte lookup table"""
+    return _POPCOUNT[bits].sum(axis=-1, dtype=np.int64)
+
+def skill_match_scores(resume_bits, job_bits, job_counts=None):
+    """Share of each job's skills found on a resume; job_bits is a skill_bit_matrix"""
+    overlap = popcount(job_bits & np.frombuffer(resume_bits, dtype=np.uint8))
+    if job_counts is None:
+        job_counts = popcount(job_bits)
+    return overlap / np.maximum(job_counts, 1)
+
+_lock = threading.Lock()
+_matcher = None
+
+def get_skill_matcher():
+    """PhraseMatcher over every skill in SKILL_DATABASE, compiled once per process.
+
+    Each skill is its own match key, so a match maps straight back to the
+    database entry whether it spans one token or several.
+    """
+    global _matcher
+    if _matcher is None:
+        with _lock:
+            if _matcher is None:
+                vocab = get_nlp(exclude=TOKENIZER_ONLY).vocab
+                matcher = PhraseMatcher(vocab, attr="LOWER")
+                for skill, words in zip(_artifact["skills"], _artifact["patterns"]):
+                    if words:
+                        matcher.add(skill, [Doc(vocab, words=list(words))])
+                _matcher = matcher
+    return _matcher
+
+@timed("skill_matching")
+def match_skills(doc):
+    """Skills from SKILL_DATABASE found in a parsed document, in a single pass"""
+    matcher = get_skill_matcher()
+    return {doc.vocab.strings[match_id] for match_id, _, _ in matcher(doc)}
+
+if __name__ == "__main__":
+    artifact = build_skill_artifact()
+    write_skill_artifact(artifact)
+    print(f"Compiled {len(artifact['skills'])} skills into {SKILLS_ARTIFACT}")
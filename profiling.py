@@ -0,0 +1,99 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# Profile every rerun (subject to the rate limit) instead of only admin-requested ones
+PROFILE_RERUNS = os.environ.get("PROFILE_RERUNS", "0") == "1"
+# Emails allowed to request a profile with the ?profile=1 query parameter
+PROFILE_ADMINS = {email.strip() for email in os.environ.get("PROFILE_ADMINS", "").split(",") if email.strip()}
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", "5"))
+# At most one profile per this many seconds per process, however many reruns ask for one
+PROFILE_MIN_INTERVAL_SECONDS = float(os.environ.get("PROFILE_MIN_INTERVAL_SECONDS", "60"))
+
+_lock = threading.Lock()
+_active = False
+_last_started = float("-inf")
+
+
+class SamplingProfiler:
+    """Samples one thread's call stack from a background thread at a fixed interval.
+
+    Stacks are counted in the folded format (``outer;inner count``) that
+    flamegraph.pl and speedscope read directly.
+    """
+
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL_MS / 1000):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+def _acquire():
+    # One profile at a time, and not more often than PROFILE_MIN_INTERVAL_SECONDS
+    global _active, _last_started
+    with _lock:
+        now = time.monotonic()
+        if _active or now - _last_started < PROFILE_MIN_INTERVAL_SECONDS:
+            return False
+        _active = True
+        _last_started = now
+        return True
+
+def _release():
+    global _active
+    with _lock:
+        _active = False
+
+def write_folded(samples, page, role, directory=PROFILE_DIR):
+    """Write folded stacks to <directory>/<time>-<page>-<role>-<pid>.folded and return the path"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{time.strftime('%Y%m%dT%H%M%S')}-{page}-{role}-{os.getpid()}.folded")
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, count in samples.most_common():
+            f.write(f"{stack} {count}\n")
+    return path
+
+@contextmanager
+def profile_rerun(page, role, requested=False):
+    """Profile the enclosed block when PROFILE_RERUNS is on or a profile was requested, rate limited.
+
+    Yields whether this run is being profiled; the profile is written when the block exits.
+    """
+    if not (PROFILE_RERUNS or requested) or not _acquire():
+        yield False
+        return
+    profiler = SamplingProfiler(threading.get_ident()).start()
+    try:
+        yield True
+    finally:
+        samples = profiler.stop()
+        try:
+            path = write_folded(samples, page, role)
+            print(f"Profiled {page} ({role}): {sum(samples.values())} samples in {path}")
+        finally:
+            _release()
@@ -0,0 +1,269 @@
+from datetime import datetime
+import pymongo
+import constants
+from database import get_database
+from model.index import RETRIEVAL_K, get_job_index
+from model.jdsrec import rank_jds
+from model.jobsrec import rank_candidates
+from model.resumes import file_digest, get_resume_features
+from model.scoring import FEATURES_VERSION, features_current, stream_job_features
+from model.skills import SKILL_VOCAB_DIGEST
+
+db = get_database()
+users_collection = db['users']
+jobs_collection = db['jobs']
+job_features_collection = db['job_features']
+recommendations_collection = db['recommendations']
+feeds_collection = db['feeds']
+
+def save_job_features(jobs, sync_graph=True):
+    #compute the jobs' scoring features in one batch and store them next to each job;
+    #embeddings go to the shared embedding store instead of the mongo documents
+    features = list(stream_job_features(job['description'] for job in jobs))
+    if features:
+        index_jobs(
+            [job['id'] for job in jobs], [job_features['embedding'] for job_features in features], sync_graph
+        )
+        job_features_collection.bulk_write([
+            pymongo.UpdateOne(
+                {'job_id': job['id']},
+                {
+                    '$set': {key: value for key, value in job_features.items() if key != 'embedding'},
+                    '$unset': {'embedding': ''},
+                },
+                upsert=True
+            )
+            for job, job_features in zip(jobs, features)
+        ])
+    return features
+
+def get_job_features(job_ids):
+    #stored features per job id, backfilling jobs posted before the index existed;
+    #embeddings are read from the job index, so a job missing from it is recomputed too
+    index = get_job_index()
+    stored = {
+        features['job_id']: features
+        for features in job_features_collection.find({'job_id': {'$in': list(job_ids)}}, {'_id': 0, 'embedding': 0})
+    }
+    missing_ids = [
+        job_id for job_id in job_ids
+        if job_id not in stored or not features_current(stored[job_id]) or job_id not in index
+    ]
+    if missing_ids:
+        missing = list(jobs_collection.find({'id': {'$in': missing_ids}}, {'_id': 0, 'id': 1, 'description': 1}))
+        for job, features in zip(missing, save_job_features(missing)):
+            stored[job['id']] = features
+    return stored
+
+def backfill_job_features(chunk_size=1000):
+    #recompute stored features for every job that lacks current ones, streaming the job board through nlp.pipe
+    current_ids = set(job_features_collection.distinct(
+        'job_id', {'version': FEATURES_VERSION, 'skill_vocab': SKILL_VOCAB_DIGEST}
+    ))
+    stale = (
+        job for job in jobs_collection.find({}, {'_id': 0, 'id': 1, 'description': 1})
+        if job['id'] not in current_ids
+    )
+    total = 0
+    while True:
+        jobs = [job for _, job in zip(range(chunk_size), stale)]
+        if not jobs:
+            return total
+        save_job_features(jobs)
+        total += len(jobs)
+
+def index_jobs(job_ids, embeddings, sync_graph=True):
+    #add job embeddings to the retrieval index shared by every process; without sync_graph only
+    #the embedding store is appended to and the HNSW graph catches up on the next search elsewhere
+    index = get_job_index()
+    index.add(job_ids, embeddings, sync_graph)
+    if sync_graph:
+        index.save()
+    return index
+
+def sync_job_index(job_ids):
+    #index any jobs that are not in the index yet, and extend and persist the search graph with jobs
+    #that pages only appended to the embedding store
+    index = get_job_index()
+    unindexed = [job_id for job_id in job_ids if job_id not in index]
+    if unindexed:
+        get_job_features(unindexed)
+    if index.sync_graph():
+        index.save()
+    return index
+
+def rank_jobs_for_applicant(resume_path, job_ids, with_components=False, extra_job_ids=(), resume_digest=None, resume=None):
+    #shortlist by embedding similarity so only the top K jobs (plus extra_job_ids) go through the full scorer;
+    #a known resume_digest or already loaded resume features spare hashing the PDF or loading them again
+    if resume is None:
+        resume = get_resume_features(resume_path, resume_digest)
+    if resume is None:
+        return []
+    shortlist = sync_job_index(job_ids).search(resume['embedding'], RETRIEVAL_K, job_ids)
+    shortlist = list(dict.fromkeys([*shortlist, *extra_job_ids]))
+    job_features = get_job_features(shortlist)
+    job_model_inputs = [{"id": job_id, "features": job_features[job_id]} for job_id in shortlist]
+    return rank_jds(resume_path, job_model_inputs, with_components=with_components, resume=resume)
+
+def rank_applicants_for_job(job_id, applicants, with_components=False):
+    #applicants are {"id", "resume_path"} dicts, the ids are echoed back in the results
+    job_features = get_job_features([job_id])[job_id]
+    if 'embedding' not in job_features:
+        job_features = {**job_features, 'embedding': get_job_index().store.get(job_id)}
+    return rank_candidates(applicants, None, job_features, with_components=with_components)
+
+def resume_digest(profile):
+    #content hash of an applicant's resume, recorded at upload or hashed on demand for older profiles
+    if profile.get('resume_digest'):
+        return profile['resume_digest']
+    try:
+        return file_digest(profile['resume_path'])
+    except (KeyError, TypeError, OSError):
+        return None
+
+def scored_with():
+    #stamp of the features a score was computed from, a row or feed without the current one is stale
+    return {'version': FEATURES_VERSION, 'skill_vocab': SKILL_VOCAB_DIGEST}
+
+def save_recommendations(rows):
+    #merge (applicant_id, job_id) rows into the persisted rankings
+    if rows:
+        recommendations_collection.bulk_write([
+            pymongo.UpdateOne(
+                {'applicant_id': row['applicant_id'], 'job_id': row['job_id']},
+                {'$set': {**row, **scored_with(), 'updated_at': datetime.now()}},
+                upsert=True
+            )
+            for row in rows
+        ])
+
+def save_applicant_feed(applicant_id, digest, results, as_of):
+    #merge ranked jobs into an applicant's persisted feed and mark it current for their resume as of a time
+    save_recommendations([{
+        'applicant_id': applicant_id,
+        'job_id': result['id'],
+        'resume_digest': digest,
+        'score': result['score'],
+        'components': result['components'],
+    } for result in results])
+    feeds_collection.update_one(
+        {'applicant_id': applicant_id},
+        {'$set': {'resume_digest': digest, **scored_with(), 'updated_at': as_of}},
+        upsert=True
+    )
+
+def feed_current(applicant_id, digest):
+    #whether an applicant's persisted feed was ranked for this resume with the current scoring model
+    feed = feeds_collection.find_one(
+        {'applicant_id': applicant_id}, {'_id': 0, 'resume_digest': 1, 'version': 1, 'skill_vocab': 1}
+    )
+    return feed is not None and digest is not None and feed['resume_digest'] == digest and features_current(feed)
+
+def materialize_for_applicant(applicant_id):
+    #bring one applicant's feed up to date, the cost scales with what changed since the last run
+    user = users_collection.find_one({'id': applicant_id}, {'_id': 0, 'profile': 1})
+    profile = (user or {}).get('profile') or {}
+    resume_path = profile.get('resume_path')
+    if resume_path is None:
+        return 0
+    #the features are loaded once here and handed to the rankers
+    resume = get_resume_features(resume_path, resume_digest(profile))
+    if resume is None:
+        return 0
+    feed = feeds_collection.find_one({'applicant_id': applicant_id})
+    #jobs posted while this run is in progress are picked up by the next one
+    started_at = datetime.now()
+
+    if feed is not None and feed['resume_digest'] == resume['digest'] and features_current(feed):
+        #same resume: only jobs posted since the last run that no job_posted event has scored yet
+        new_job_ids = [job['id'] for job in jobs_collection.find(
+            {'created_at': {'$gte': feed['updated_at']}}, {'_id': 0, 'id': 1}
+        )]
+        ranked_job_ids = set(recommendations_collection.distinct(
+            'job_id', {'applicant_id': applicant_id, 'job_id': {'$in': new_job_ids}}
+        ))
+        new_job_ids = [job_id for job_id in new_job_ids if job_id not in ranked_job_ids]
+        if not new_job_ids:
+            return 0
+        job_features = get_job_features(new_job_ids)
+        results = rank_jds(
+            resume_path,
+            [{"id": job_id, "features": job_features[job_id]} for job_id in new_job_ids],
+            with_components=True,
+            resume=resume
+        )
+    else:
+        #new resume or scoring model: the shortlist, plus every job already ranked for this applicant
+        #so no row is left stale
+        job_ids = [job['id'] for job in jobs_collection.find({}, {'_id': 0, 'id': 1})]
+        ranked_job_ids = recommendations_collection.distinct('job_id', {'applicant_id': applicant_id})
+        results = rank_jobs_for_applicant(
+            resume_path, job_ids, with_components=True, extra_job_ids=ranked_job_ids, resume=resume
+        )
+
+    save_applicant_feed(applicant_id, resume['digest'], results, started_at)
+    return len(results)
+
+def materialize_for_job(job_id):
+    #score one newly posted job against every applicant with a resume
+    applicants = [{
+        'id': user['id'],
+        'resume_path': user['profile']['resume_path'],
+        'resume_digest': resume_digest(user['profile']),
+    } for user in users_collection.find(
+        {'role': 'applicant', 'profile.resume_path': {'$type': 'string'}},
+        {'_id': 0, 'id': 1, 'profile.resume_path': 1, 'profile.resume_digest': 1}
+    )]
+    return len(score_applicants_for_job(job_id, applicants, rescore=True))
+
+def read_applicant_scores(job_id, applicants):
+    #persisted scores of {"id", "resume_path", "resume_digest"} applicants for a job, best first, and the
+    #applicants still to be scored: those without a row for their current resume and scoring model
+    rows = {
+        row['applicant_id']: row for row in recommendations_collection.find(
+            {'job_id': job_id, 'applicant_id': {'$in': [applicant['id'] for applicant in applicants]}},
+            {'_id': 0, 'applicant_id': 1, 'resume_digest': 1, 'score': 1, 'version': 1, 'skill_vocab': 1}
+        )
+    }
+    stale = [
+        applicant for applicant in applicants
+        if applicant['resume_digest'] is None
+        or rows.get(applicant['id'], {}).get('resume_digest') != applicant['resume_digest']
+        or not features_current(rows[applicant['id']])
+    ]
+    stale_ids = {applicant['id'] for applicant in stale}
+    scores = [
+        {'id': applicant['id'], 'score': rows[applicant['id']]['score']}
+        for applicant in applicants if applicant['id'] in rows and applicant['id'] not in stale_ids
+    ]
+    return sorted(scores, key=lambda x: x['score'], reverse=True), stale
+
+def score_applicants_for_job(job_id, applicants, rescore=False):
+    #scores of {"id", "resume_path", "resume_digest"} applicants for a job, best first;
+    #only applicants without a current row are scored, the rest are read back
+    scores, stale = ([], applicants) if rescore else read_applicant_scores(job_id, applicants)
+    if stale:
+        digests = {applicant['id']: applicant['resume_digest'] for applicant in stale}
+        results = rank_applicants_for_job(job_id, stale, with_components=True)
+        save_recommendations([{
+            'applicant_id': result['id'],
+            'job_id': job_id,
+            'resume_digest': digests[result['id']],
+            'score': result['score'],
+            'components': result['components'],
+        } for result in results])
+        scores += [{'id': result['id'], 'score': result['score']} for result in results]
+    return sorted(scores, key=lambda x: x['score'], reverse=True)
+
+def read_recommendations(applicant_id, exclude_job_ids=(), limit=constants.FEED_PAGE_SIZE, cursor=None):
+    #one page of an applicant's materialized feed, best first, and the cursor of the next page (None after the last);
+    #pages are keyed on (score, job_id) so each one is an index range scan however deep the applicant has swiped
+    query = {'applicant_id': applicant_id, 'job_id': {'$nin': list(exclude_job_ids)}}
+    if cursor is not None:
+        score, job_id = cursor
+        query['$or'] = [{'score': {'$lt': score}}, {'score': score, 'job_id': {'$gt': job_id}}]
+    rows = list(recommendations_collection.find(query, {'_id': 0, 'job_id': 1, 'score': 1}).sort(
+        [('score', pymongo.DESCENDING), ('job_id', pymongo.ASCENDING)]
+    ).limit(limit))
+    next_cursor = (rows[-1]['score'], rows[-1]['job_id']) if len(rows) == limit else None
+    return rows, next_cursor
@@ -0,0 +1,162 @@
+import argparse
+import asyncio
+import functools
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import constants
+from model.metrics import start_metrics_server, timed
+from recommendations import materialize_for_applicant, score_applicants_for_job
+
+#largest request body accepted, applicant lists included
+MAX_BODY_BYTES = 1 << 20
+REASONS = {
+    200: 'OK', 202: 'Accepted', 400: 'Bad Request', 404: 'Not Found', 413: 'Payload Too Large',
+    500: 'Internal Server Error',
+}
+
+@timed('service.rank_jobs_for_applicant')
+def rank_jobs_for_applicant(payload):
+    #bring an applicant's persisted feed up to date, the app reads it back page by page
+    return {'ranked': materialize_for_applicant(payload['applicant_id'])}
+
+@timed('service.rank_applicants_for_job')
+def rank_applicants_for_job(payload):
+    #{"id", "score"} of {"id", "resume_path", "resume_digest"} applicants for a job, best first
+    return {'results': score_applicants_for_job(payload['job_id'], payload['applicants'])}
+
+def _applicants_key(payload):
+    return (payload['job_id'], tuple(
+        (applicant['id'], applicant.get('resume_digest')) for applicant in payload['applicants']
+    ))
+
+#path -> (handler taking the JSON payload, key under which identical in-flight requests share one run)
+ENDPOINTS = {
+    '/rank_jobs_for_applicant': (rank_jobs_for_applicant, lambda payload: payload['applicant_id']),
+    '/rank_applicants_for_job': (rank_applicants_for_job, _applicants_key),
+}
+
+class RankingService:
+    """Runs ranking requests on an executor, at most max_concurrency at a time.
+
+    Identical requests arriving while one is running wait for its result
+    instead of ranking again. A request with "wait": false is answered as soon
+    as its run is scheduled; the front end sends those so it never waits on
+    ranking. Handlers are plain functions of the JSON payload, so tests can
+    pass their own endpoints and executor.
+    """
+
+    def __init__(self, executor, max_concurrency=constants.SERVICE_MAX_CONCURRENCY, endpoints=ENDPOINTS):
+        self.executor = executor
+        self.endpoints = endpoints
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.inflight = {}
+
+    def schedule(self, path, payload):
+        #the run answering a request, shared with identical requests already in flight
+        handler, key_of = self.endpoints[path]
+        key = (path, key_of(payload))
+        task = self.inflight.get(key)
+        if task is None:
+            task = self.inflight[key] = asyncio.ensure_future(self._run(handler, payload))
+            task.add_done_callback(functools.partial(self._finished, key))
+        return task
+
+    def _finished(self, key, task):
+        self.inflight.pop(key, None)
+        #logged here so runs nobody waits on do not fail silently
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Error handling {key[0]}: {str(task.exception())}")
+
+    async def call(self, path, payload):
+        #a client that disconnects must not cancel the run other requests are waiting on
+        return await asyncio.shield(self.schedule(path, payload))
+
+    async def _run(self, handler, payload):
+        async with self.semaphore:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, handler, payload)
+
+    async def respond(self, method, path, body):
+        #(status, JSON-ready response) of one request
+        if method == 'GET' and path == '/health':
+            return 200, {'status': 'ok', 'inflight': len(self.inflight)}
+        if method != 'POST' or path not in self.endpoints:
+            return 404, {'error': f'no endpoint {method} {path}'}
+        try:
+            payload = json.loads(body or b'{}')
+            key_of = self.endpoints[path][1]
+            key_of(payload)
+        except (ValueError, KeyError, TypeError) as e:
+            return 400, {'error': f'invalid request: {e!r}'}
+        if not payload.get('wait', True):
+            self.schedule(path, payload)
+            return 202, {'accepted': True}
+        try:
+            return 200, await self.call(path, payload)
+        except Exception as e:
+            return 500, {'error': str(e)}
+
+    async def handle(self, reader, writer):
+        #one HTTP/1.1 request per connection, JSON in and out
+        try:
+            request_line = await reader.readline()
+            if not request_line:
+                return
+            method, path, _ = request_line.decode('latin-1').split(' ', 2)
+            headers = {}
+            while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get('content-length', 0))
+            if length > MAX_BODY_BYTES:
+                status, response = 413, {'error': f'body over {MAX_BODY_BYTES} bytes'}
+            else:
+                status, response = await self.respond(method, path.split('?', 1)[0], await reader.readexactly(length))
+        except (ValueError, asyncio.IncompleteReadError) as e:
+            status, response = 400, {'error': f'malformed request: {e!r}'}
+        try:
+            body = json.dumps(response).encode('utf-8')
+            writer.write(
+                f'HTTP/1.1 {status} {REASONS[status]}\r\n'
+                f'Content-Type: application/json\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n'
+                .encode('latin-1') + body
+            )
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+def make_executor(processes=constants.SERVICE_PROCESSES, threads=constants.SERVICE_THREADS):
+    #worker processes scale past the GIL, each loads its own models and MongoDB client;
+    #threads share one copy of both and suit a lightly loaded service
+    if processes > 0:
+        return ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context('spawn'))
+    return ThreadPoolExecutor(threads, thread_name_prefix='ranking')
+
+async def serve(host=constants.SERVICE_HOST, port=constants.SERVICE_PORT, socket_path=constants.SERVICE_SOCKET):
+    #serve on a Unix socket when socket_path is set, TCP otherwise, until cancelled
+    with make_executor() as executor:
+        service = RankingService(executor)
+        if socket_path:
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+            server = await asyncio.start_unix_server(service.handle, path=socket_path)
+        else:
+            server = await asyncio.start_server(service.handle, host, port)
+        print(f"Ranking service listening on {socket_path or f'{host}:{port}'}")
+        async with server:
+            await server.serve_forever()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the job and applicant rankers over HTTP")
+    parser.add_argument("--host", default=constants.SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=constants.SERVICE_PORT)
+    parser.add_argument("--socket", default=constants.SERVICE_SOCKET, help="listen on this Unix socket instead of TCP")
+    args = parser.parse_args()
+    start_metrics_server()
+    try:
+        asyncio.run(serve(args.host, args.port, args.socket))
+    except KeyboardInterrupt:
+        pass
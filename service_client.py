@@ -0,0 +1,121 @@
+import http.client
+import json
+import socket
+from urllib.parse import urlsplit
+import constants
+
+
+class ServiceUnavailable(Exception):
+    """The ranking service could not be reached or did not answer in time"""
+
+class ServiceError(Exception):
+    """The ranking service answered with an error"""
+
+class LocalRankingClient:
+    """The same calls as RankingClient without a service.
+
+    rank_* calls rank in this process; request_* calls queue the work for the
+    background worker and return at once. Used when no service is configured,
+    as the fallback when it is down, and as the stand-in client in tests.
+    """
+
+    def rank_jobs_for_applicant(self, applicant_id):
+        from recommendations import materialize_for_applicant
+        return materialize_for_applicant(applicant_id)
+
+    def rank_applicants_for_job(self, job_id, applicants):
+        from recommendations import score_applicants_for_job
+        return score_applicants_for_job(job_id, applicants)
+
+    def request_feed(self, applicant_id):
+        from worker import enqueue
+        enqueue('resume_uploaded', {'applicant_id': applicant_id})
+
+    def request_scores(self, job_id, applicants):
+        from worker import enqueue
+        enqueue('applicants_unscored', {'job_id': job_id, 'applicants': applicants})
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path, timeout):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+class RankingClient:
+    """Calls the ranking service at http://host:port or unix:///path/to.sock.
+
+    With a fallback client, requests are ranked through it when the service
+    cannot be reached. A request that times out is not retried in-process,
+    since the service is still working on it.
+    """
+
+    def __init__(self, url=constants.RECOMMENDER_URL, timeout=constants.SERVICE_TIMEOUT_SECONDS, fallback=None):
+        self.url = urlsplit(url)
+        self.timeout = timeout
+        self.fallback = fallback
+
+    def _connection(self, timeout):
+        if self.url.scheme == 'unix':
+            return _UnixHTTPConnection(self.url.path, timeout)
+        return http.client.HTTPConnection(self.url.hostname, self.url.port or 80, timeout=timeout)
+
+    def _post(self, endpoint, payload, timeout=None):
+        connection = self._connection(timeout or self.timeout)
+        try:
+            connection.request('POST', endpoint, body=json.dumps(payload), headers={'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            body = json.loads(response.read() or b'{}')
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            raise ServiceUnavailable(f"{endpoint}: {e!r}") from e
+        finally:
+            connection.close()
+        if response.status not in (200, 202):
+            raise ServiceError(f"{endpoint}: {response.status} {body.get('error')}")
+        return body
+
+    def _call(self, endpoint, payload, fallback, timeout=None):
+        try:
+            return self._post(endpoint, payload, timeout)
+        except ServiceUnavailable as e:
+            if self.fallback is None or isinstance(e.__cause__, TimeoutError):
+                raise
+            print(f"Ranking service unavailable, using the fallback: {str(e)}")
+            return fallback()
+
+    def rank_jobs_for_applicant(self, applicant_id):
+        #number of jobs (re)ranked into the applicant's persisted feed
+        return self._call(
+            '/rank_jobs_for_applicant', {'applicant_id': applicant_id},
+            lambda: {'ranked': self.fallback.rank_jobs_for_applicant(applicant_id)}
+        )['ranked']
+
+    def rank_applicants_for_job(self, job_id, applicants):
+        #{"id", "score"} of {"id", "resume_path", "resume_digest"} applicants, best first
+        return self._call(
+            '/rank_applicants_for_job', {'job_id': job_id, 'applicants': applicants},
+            lambda: {'results': self.fallback.rank_applicants_for_job(job_id, applicants)}
+        )['results']
+
+    def request_feed(self, applicant_id):
+        #have the service bring the applicant's feed up to date, without waiting for it
+        self._call(
+            '/rank_jobs_for_applicant', {'applicant_id': applicant_id, 'wait': False},
+            lambda: self.fallback.request_feed(applicant_id), constants.SERVICE_SUBMIT_TIMEOUT_SECONDS
+        )
+
+    def request_scores(self, job_id, applicants):
+        #have the service score applicants for a job, without waiting for it
+        self._call(
+            '/rank_applicants_for_job', {'job_id': job_id, 'applicants': applicants, 'wait': False},
+            lambda: self.fallback.request_scores(job_id, applicants), constants.SERVICE_SUBMIT_TIMEOUT_SECONDS
+        )
+
+def get_ranking_client(url=constants.RECOMMENDER_URL):
+    #the service when one is configured, falling back to in-process ranking; in-process otherwise
+    if url:
+        return RankingClient(url, fallback=LocalRankingClient())
+    return LocalRankingClient()
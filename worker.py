@@ -0,0 +1,87 @@
+import argparse
+import time
+from datetime import datetime, timedelta
+import pymongo
+import constants
+from database import get_database
+from model.metrics import start_metrics_server
+from recommendations import (
+    backfill_job_features, materialize_for_applicant, materialize_for_job, score_applicants_for_job
+)
+
+tasks_collection = get_database()['tasks']
+
+#event kind -> handler taking the event payload
+HANDLERS = {
+    'resume_uploaded': lambda payload: materialize_for_applicant(payload['applicant_id']),
+    'job_posted': lambda payload: materialize_for_job(payload['job_id']),
+    'applicants_unscored': lambda payload: len(score_applicants_for_job(payload['job_id'], payload['applicants'])),
+}
+
+def enqueue(kind, payload):
+    #queue an event for the worker, an identical pending event is not queued twice
+    now = datetime.now()
+    tasks_collection.update_one(
+        {'kind': kind, 'payload': payload, 'status': 'pending'},
+        {'$setOnInsert': {'created_at': now, 'not_before': now, 'attempts': 0}},
+        upsert=True
+    )
+
+def retry_delay(attempts):
+    #exponential backoff after a task's nth failed attempt
+    seconds = constants.TASK_RETRY_SECONDS * 2 ** (attempts - 1)
+    return timedelta(seconds=min(seconds, constants.TASK_RETRY_MAX_SECONDS))
+
+def claim_task():
+    #atomically take the oldest pending task that is not backing off, or one whose worker died mid-run
+    now = datetime.now()
+    stale = now - timedelta(seconds=constants.TASK_TIMEOUT_SECONDS)
+    return tasks_collection.find_one_and_update(
+        {'$or': [
+            {'status': 'pending', 'not_before': {'$not': {'$gt': now}}},
+            {'status': 'running', 'started_at': {'$lt': stale}},
+        ]},
+        {'$set': {'status': 'running', 'started_at': datetime.now()}, '$inc': {'attempts': 1}},
+        sort=[('created_at', pymongo.ASCENDING)],
+        return_document=pymongo.ReturnDocument.AFTER
+    )
+
+def run_task(task):
+    try:
+        result = HANDLERS[task['kind']](task['payload'])
+    except Exception as e:
+        print(f"Error running task {task['kind']} {task['payload']}: {str(e)}")
+        status = 'failed' if task['attempts'] >= constants.TASK_MAX_ATTEMPTS else 'pending'
+        tasks_collection.update_one(
+            {'_id': task['_id']},
+            {'$set': {'status': status, 'error': str(e), 'not_before': datetime.now() + retry_delay(task['attempts'])}}
+        )
+        return
+    tasks_collection.update_one(
+        {'_id': task['_id']},
+        {'$set': {'status': 'done', 'finished_at': datetime.now(), 'result': result}}
+    )
+
+def run_worker(poll_interval=constants.WORKER_POLL_SECONDS, once=False):
+    #process tasks until the queue is empty (once) or forever
+    while True:
+        task = claim_task()
+        if task is None:
+            if once:
+                return
+            time.sleep(poll_interval)
+            continue
+        print(f"Running task {task['kind']} {task['payload']}")
+        run_task(task)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Materialize applicant job feeds in the background")
+    parser.add_argument("--once", action="store_true", help="exit when the queue is empty")
+    parser.add_argument("--backfill-jobs", action="store_true",
+                        help="compute missing or outdated job features for the whole job board, then exit")
+    args = parser.parse_args()
+    start_metrics_server()
+    if args.backfill_jobs:
+        print(f"Backfilled features for {backfill_job_features()} jobs")
+    else:
+        run_worker(once=args.once)